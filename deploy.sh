@@ -32,18 +32,19 @@ scp -r "$LOCAL_SERVER_DIR/static" $BOARD_USER@$BOARD_IP:$BOARD_DIR/
 scp "$LOCAL_SERVICE_DIR/start.sh" $BOARD_USER@$BOARD_IP:$BOARD_DIR/
 scp "$LOCAL_SERVICE_DIR/adcserver.service" $BOARD_USER@$BOARD_IP:$BOARD_DIR/
 
-# 2. 실행 권한 부여
-echo "[2/6] 🧱 start.sh 실행 권한 부여..."
+# 2. 실행 권한 부여 + 정적파일 gzip 사본 생성 (서버가 Accept-Encoding: gzip 요청에 그대로 전송)
+echo "[2/6] 🧱 start.sh 실행 권한 부여 / static gzip..."
 ssh $BOARD_USER@$BOARD_IP << EOF
 dos2unix $BOARD_DIR/start.sh
 chmod +x $BOARD_DIR/start.sh
+gzip -kf9 $BOARD_DIR/static/*.html $BOARD_DIR/static/*.js $BOARD_DIR/static/*.css
 EOF
 
-# 3. C 코드 빌드
+# 3. C 코드 빌드 (Zynq Cortex-A9: -O3 + NEON, gcc 기본값 -O0이면 DSP 루프가 최적화되지 않음)
 echo "[3/6] 🧱 iio_reader.c 빌드..."
 ssh $BOARD_USER@$BOARD_IP << EOF
 cd $BOARD_DIR
-gcc iio_reader.c -o iio_reader -liio -lm
+gcc -O3 -mcpu=cortex-a9 -mfpu=neon iio_reader.c -o iio_reader -liio -lm
 EOF
 
 # 4. service 파일 반영
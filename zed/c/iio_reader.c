@@ -32,6 +32,10 @@
   #include <sys/time.h>
 #endif
 
+#ifndef M_PI
+  #define M_PI 3.14159265358979323846
+#endif
+
 // ---------- Block header (kept as before) ----------
 #ifdef _MSC_VER
   #pragma pack(push, 1)
@@ -56,8 +60,8 @@ enum {
 typedef struct {
     double sampling_frequency;     // e.g. 1e6
     double target_rate_hz;         // e.g. 10.0
-    double lpf_cutoff_hz;          // info
-    int    lpf_order;              // 4 (we use 4 sections SOS below)
+    double lpf_cutoff_hz;          // LPF design cutoff (Hz)
+    int    lpf_order;              // 4 (2 SOS sections, designed at startup)
     int    movavg_r;               // window at TA rate
 
     // R = (alpha*beta*gamma) * log_k(sensor/standard) + b
@@ -75,10 +79,21 @@ typedef struct {
 
 
 // ---------- Runtime state ----------
+// Streaming moving average: last N inputs (ring) + running sum, carried across blocks
+typedef struct {
+    float*  hist;          // [N] ring of the most recent inputs
+    double  sum;           // sum of hist[0..fill)
+    int     N, idx, fill;
+} RunningMean;
+
 typedef struct {
     double* lpf_state;     // [n_ch][n_sections*2] DF2T states
-    float*  avg_tail;      // carry-over for TA: up to (decim-1)*n_ch
-    int     avg_tail_len;  // 0..(decim-1)
+    double* ta_acc;        // TA partial sums per channel [n_ch]
+    int     ta_count;      // samples accumulated in ta_acc: 0..(decim-1)
+    int     lpf_primed;    // lpf_state warm-started from the first block
+    float*  ma_hist;       // backing store for all RunningMean rings
+    RunningMean ma_ch[8];  // CH MA (smoothing) per channel
+    RunningMean ravg[4];   // R MA per quad (at TA rate)
 } ProcessingState;
 
 // ---------- Helpers ----------
@@ -90,63 +105,133 @@ static int read_attr_str(struct iio_channel *ch, const char *attr, char *dst, si
     return 1;
 }
 
-static inline double polyval_f64(const double* c, int len, double x) {
-    double r = 0.0;
-    for (int i = 0; i < len; i++) r = r * x + c[i];
-    return r;
+// Estrin's scheme for highest-first coefficients (np.polyval order, len <= 10):
+// pairs (a_k + a_{k+1} x) are independent, then folded with x^2, x^4, x^8
+// → short dependency chains instead of Horner's len-long serial chain
+#define ESTRIN_LEVELS 4   // 10 → 5 → 3 → 2 → 1
+
+static inline void estrin_powers(double x, double xp[ESTRIN_LEVELS]) {
+    xp[0] = x;
+    for (int l = 1; l < ESTRIN_LEVELS; l++) xp[l] = xp[l - 1] * xp[l - 1];
 }
 
-// Simple centered moving average at TA rate
-static void moving_average_f32(const float* in, float* out, int len, int N) {
-    if (N <= 1) { memcpy(out, in, (size_t)len * sizeof(float)); return; }
-    const int half = N / 2;
-
-    // 누적합 버퍼 (double 권장: 누적 오차↓)
-    static double* psum = NULL;
-    static int cap = 0;
-    const int need = len + 1;
-    if (cap < need) {
-        free(psum);
-        cap = need;
-        psum = (double*)malloc((size_t)cap * sizeof(double));
-        if (!psum) { // 메모리 부족 시 안전하게 원본 복사
-            memcpy(out, in, (size_t)len * sizeof(float));
-            return;
-        }
+static inline double estrin_fold(const double* c, int len, const double xp[ESTRIN_LEVELS]) {
+    if (len <= 0) return 0.0;
+    double t[10];
+    int n = len;
+    for (int k = 0; k < n; k++) t[k] = c[n - 1 - k];   // ascending order
+    for (int l = 0; n > 1; l++) {
+        int m = 0;
+        for (int j = 0; j + 1 < n; j += 2) t[m++] = t[j] + t[j + 1] * xp[l];
+        if (n & 1) t[m++] = t[n - 1];
+        n = m;
     }
+    return t[0];
+}
 
-    // psum[i] = in[0] + ... + in[i-1], psum[0] = 0
-    psum[0] = 0.0;
-    for (int i = 0; i < len; i++) psum[i + 1] = psum[i] + (double)in[i];
-
-    for (int i = 0; i < len; i++) {
-        int start = i - half;
-        int end   = i + (N - 1 - half);
-        if (start < 0) start = 0;
-        if (end >= len) end = len - 1;
-        const int cnt = end - start + 1;
-        const double sum = psum[end + 1] - psum[start];
-        out[i] = (float)(sum / (double)cnt);
+static inline double polyval_estrin_f64(const double* c, int len, double x) {
+    double xp[ESTRIN_LEVELS];
+    estrin_powers(x, xp);
+    return estrin_fold(c, len, xp);
+}
+
+// Rational num(x)/den(x): powers of x computed once and shared by both polynomials;
+// the two folds are independent chains the CPU can overlap
+static inline double polyfrac_estrin_f64(const double* num, int num_len,
+                                         const double* den, int den_len, double x) {
+    double xp[ESTRIN_LEVELS];
+    estrin_powers(x, xp);
+    const double n = estrin_fold(num, num_len, xp);
+    const double d = estrin_fold(den, den_len, xp);
+    return n / ((fabs(d) < 1e-12) ? 1e-12 : d);
+}
+
+// Trailing moving average over the last N samples, continuous across blocks
+// (O(1) per sample; window is partial only at stream start, never at block edges)
+static inline float running_mean_push(RunningMean* m, float v) {
+    if (m->N <= 1) return v;
+    if (m->fill == m->N) m->sum -= (double)m->hist[m->idx];
+    else                 m->fill++;
+    m->hist[m->idx] = v;
+    m->sum += (double)v;
+    if (++m->idx == m->N) {
+        // ring wrapped (always full here): re-sum once per N samples → no rounding drift
+        double acc = 0.0;
+        for (int k = 0; k < m->N; k++) acc += (double)m->hist[k];
+        m->sum = acc;
+        m->idx = 0;
     }
+    return (float)(m->sum / (double)m->fill);
 }
 
 
-// SOS DF2T in-place for single channel buffer x[len]
-// state: [n_sections*2]
-static void sos_df2t_inplace(float* x, int len, const double sos[][6], int n_sections, double* state) {
+// SOS DF2T over an interleaved block src/dst[len x stride], first n_ch (<= 8) columns.
+// Channel loop innermost: the n_ch filters are independent, so each section step is an
+// n_ch-wide vectorizable loop instead of one serial chain per channel.
+// state: per channel [n_sections*2] (channel c at state + c*n_sections*2); src may equal dst
+static void sos_df2t_multi(const float* src, float* dst, int len, int stride, int n_ch,
+                           const double sos[][6], int n_sections, double* state) {
+    double z1[8], z2[8];
     for (int s = 0; s < n_sections; s++) {
         const double b0 = sos[s][0], b1 = sos[s][1], b2 = sos[s][2];
         const double a1 = sos[s][4], a2 = sos[s][5]; // a0 assumed 1
-        double z1 = state[s*2 + 0], z2 = state[s*2 + 1];
+        for (int c = 0; c < n_ch; c++) {
+            z1[c] = state[(size_t)c * (size_t)(n_sections*2) + (size_t)(s*2 + 0)];
+            z2[c] = state[(size_t)c * (size_t)(n_sections*2) + (size_t)(s*2 + 1)];
+        }
+        const float* in = (s == 0) ? src : dst;   // later sections run in place on dst
         for (int i = 0; i < len; i++) {
-            const double xi = x[i];
-            const double yi = b0 * xi + z1;
-            z1 = b1 * xi - a1 * yi + z2;
-            z2 = b2 * xi - a2 * yi;
-            x[i] = (float)yi;
+            const float* xr = in  + (size_t)i * (size_t)stride;
+            float*       yr = dst + (size_t)i * (size_t)stride;
+            for (int c = 0; c < n_ch; c++) {
+                const double xi = xr[c];
+                const double yi = b0 * xi + z1[c];
+                z1[c] = b1 * xi - a1 * yi + z2[c];
+                z2[c] = b2 * xi - a2 * yi;
+                yr[c] = (float)yi;
+            }
         }
-        state[s*2 + 0] = z1;
-        state[s*2 + 1] = z2;
+        for (int c = 0; c < n_ch; c++) {
+            state[(size_t)c * (size_t)(n_sections*2) + (size_t)(s*2 + 0)] = z1[c];
+            state[(size_t)c * (size_t)(n_sections*2) + (size_t)(s*2 + 1)] = z2[c];
+        }
+    }
+}
+
+
+// Butterworth low-pass as SOS (order = 2*n_sections), bilinear transform with prewarp.
+// Designed once per (fs, cutoff, order) at startup; each section has unity DC gain,
+// sections ordered by increasing Q (same pole order as scipy butter(..., output='sos')).
+static void butter_lowpass_sos(double fs, double fc, int n_sections, double sos[][6]) {
+    const double order = 2.0 * n_sections;
+    double wn = fc / (0.5 * fs);
+    if (!(wn > 1e-6)) wn = 1e-6;              // also catches NaN
+    if (wn > 0.999999) wn = 0.999999;
+    const double K  = tan(M_PI * 0.5 * wn);   // prewarped analog cutoff
+    const double K2 = K * K;
+    for (int s = 0; s < n_sections; s++) {
+        const int k = n_sections - 1 - s;     // low-Q pole pair first
+        const double q  = -2.0 * cos(M_PI * (2.0 * k + order + 1.0) / (2.0 * order)); // 1/Q
+        const double a0 = 1.0 + q * K + K2;
+        const double g  = K2 / a0;
+        sos[s][0] = g; sos[s][1] = 2.0 * g; sos[s][2] = g;
+        sos[s][3] = 1.0;
+        sos[s][4] = 2.0 * (K2 - 1.0) / a0;
+        sos[s][5] = (1.0 - q * K + K2) / a0;
+    }
+}
+
+// Steady-state DF2T states for a constant input x0 (same as scipy sosfilt_zi(sos) * x0)
+// → filter starts settled at the first sample's level instead of ramping up from 0
+static void sos_df2t_init_steady(const double sos[][6], int n_sections, double* state, double x0) {
+    double x = x0;
+    for (int s = 0; s < n_sections; s++) {
+        const double b0 = sos[s][0], b1 = sos[s][1], b2 = sos[s][2];
+        const double a1 = sos[s][4], a2 = sos[s][5];
+        const double y = x * (b0 + b1 + b2) / (1.0 + a1 + a2); // DC gain of this section
+        state[s*2 + 0] = y - b0 * x;
+        state[s*2 + 1] = b2 * x - a2 * y;
+        x = y;
     }
 }
 
@@ -197,6 +282,10 @@ static void check_and_process_stdin(SignalParams* P) {
                     P->E = temp[0];
                     P->F = temp[1];
                 }
+            } else if (strcmp(key, "lpf_cutoff_hz") == 0) {
+                // 메인 루프가 값 변화를 보고 SOS를 재설계 (IIO 버퍼/상태 재할당 없음)
+                const double fc = atof(values_str);
+                if (fc > 0.0) P->lpf_cutoff_hz = fc;
             }
         }
     }
@@ -288,6 +377,20 @@ static int open_uart(const char *dev, int baud)
 
     return fd;
 }
+
+// write() until all bytes are sent (UART is O_SYNC: one call per block, not per row)
+static void uart_write_all(int fd, const char *p, size_t n)
+{
+    while (n > 0) {
+        const ssize_t w = write(fd, p, n);
+        if (w < 0) {
+            if (errno == EINTR) continue;
+            return;
+        }
+        p += w;
+        n -= (size_t)w;
+    }
+}
 #endif
 
 
@@ -355,7 +458,8 @@ int main(int argc, char **argv) {
     // Precompute ratio/log constants
     const double base      = (P.k > 1.0) ? P.k : 10.0;
     const double inv_log_b = 1.0 / log(base);
-    const double r_scale   = (P.alpha * P.beta) * P.gamma;
+    // R = alpha*beta*gamma * ln(ratio)/ln(base) + b → fold all constant factors into one gain
+    const double r_gain    = (P.alpha * P.beta) * P.gamma * inv_log_b;
 
     // ---------- IIO setup ----------
     struct iio_context *ctx = iio_create_network_context(ip);
@@ -396,10 +500,10 @@ int main(int argc, char **argv) {
 
     // ---------- DSP coeffs (SOS) & state ----------
     const int n_sections = 2; // ❗ 4를 2로 수정
-    const double sos[2][6] = { // ❗ 4를 2로 수정
-        {3.728052e-09, 7.456103e-09, 3.728052e-09, 1.000000e+00, -1.971149e+00, 9.713918e-01},
-        {1.000000e+00, 2.000000e+00, 1.000000e+00, 1.000000e+00, -1.987805e+00, 9.880500e-01},
-    };
+    double sos_design[2][6];  // P.lpf_order=4 → 2 sections, designed from (fs, cutoff); redesigned only on a cutoff command
+    butter_lowpass_sos(P.sampling_frequency, P.lpf_cutoff_hz, n_sections, sos_design);
+    double sos_cutoff_hz = P.lpf_cutoff_hz;
+    const double (*sos)[6] = (const double (*)[6])sos_design;
 
     ProcessingState S = (ProcessingState){0};
     S.lpf_state = (double*)calloc((size_t)n_ch * (size_t)n_sections * 2, sizeof(double));
@@ -407,34 +511,39 @@ int main(int argc, char **argv) {
 
     const int decim = (int)(P.sampling_frequency / P.target_rate_hz);
     if (decim <= 0) { fprintf(stderr, "ERR: invalid decim\n"); free(S.lpf_state); iio_buffer_destroy(buf); free(in_ch); free(scales); iio_context_destroy(ctx); return 8; }
-    S.avg_tail = (float*)calloc((size_t)decim * (size_t)n_ch, sizeof(float));
-    if (!S.avg_tail) { fprintf(stderr, "ERR: alloc avg_tail\n"); free(S.lpf_state); iio_buffer_destroy(buf); free(in_ch); free(scales); iio_context_destroy(ctx); return 9; }
-    S.avg_tail_len = 0;
+    S.ta_acc = (double*)calloc((size_t)n_ch, sizeof(double));
+    if (!S.ta_acc) { fprintf(stderr, "ERR: alloc ta_acc\n"); free(S.lpf_state); iio_buffer_destroy(buf); free(in_ch); free(scales); iio_context_destroy(ctx); return 9; }
+    S.ta_count = 0;
+
+    // Moving-average rings (CH MA per channel at input rate, R MA per quad at TA rate)
+    const int ma_ch_n = (movavg_ch > 1) ? movavg_ch : 1;
+    const int ma_r_n  = (P.movavg_r > 1) ? P.movavg_r : 1;
+    S.ma_hist = (float*)calloc((size_t)n_ch * (size_t)ma_ch_n + 4u * (size_t)ma_r_n, sizeof(float));
+    if (!S.ma_hist) { fprintf(stderr, "ERR: alloc ma_hist\n"); free(S.ta_acc); free(S.lpf_state); iio_buffer_destroy(buf); free(in_ch); free(scales); iio_context_destroy(ctx); return 9; }
+    for (int c = 0; c < n_ch; c++)
+        S.ma_ch[c] = (RunningMean){ S.ma_hist + (size_t)c * (size_t)ma_ch_n, 0.0, movavg_ch, 0, 0 };
+    for (int q = 0; q < 4; q++)
+        S.ravg[q] = (RunningMean){ S.ma_hist + (size_t)n_ch * (size_t)ma_ch_n + (size_t)q * (size_t)ma_r_n, 0.0, P.movavg_r, 0, 0 };
 
     // ---------- Pre-allocate working buffers (no alloc in loop) ----------
-    float *raw_f32  = (float*)malloc(sizeof(float) * (size_t)block_samples * (size_t)n_in);
-    float *lpf_f32  = (float*)malloc(sizeof(float) * (size_t)block_samples * (size_t)n_in);
-    float *ma_ch_out = (float*)malloc(sizeof(float) * (size_t)block_samples * (size_t)n_in); // ❗ CH MA 결과 버퍼 추가
-    float *chan_buf = (float*)malloc(sizeof(float) * (size_t)block_samples);
+    // one compact [block_samples x n_ch] work block: raw → LPF in place → CH MA/TA read it row by row
+    float *raw_f32  = (float*)malloc(sizeof(float) * (size_t)block_samples * (size_t)n_ch);
 
     const int max_ta_out = block_samples / decim + 2;
-    float *ta_combined = (float*)malloc(sizeof(float) * (size_t)(block_samples + decim) * (size_t)n_ch);
     float *ta_out      = (float*)malloc(sizeof(float) * (size_t)max_ta_out * (size_t)n_ch);
 
     // Stage5/9 work arrays (TA rate)
-    float *R_buf    = (float*)malloc(sizeof(float) * (size_t)max_ta_out);
-    float *Ravg_buf = (float*)malloc(sizeof(float) * (size_t)max_ta_out);
     float *S5_out   = (float*)malloc(sizeof(float) * (size_t)max_ta_out * 4);
     float *Y2_out   = (float*)malloc(sizeof(float) * (size_t)max_ta_out * 4);
     float *Y3_out   = (float*)malloc(sizeof(float) * (size_t)max_ta_out * 4);
     float *YT_out   = (float*)malloc(sizeof(float) * (size_t)max_ta_out * 4);
 
-    if (!raw_f32 || !lpf_f32 || !chan_buf || !ta_combined || !ta_out ||
-        !R_buf || !Ravg_buf || !S5_out || !YT_out) {
+    if (!raw_f32 || !ta_out ||
+        !S5_out || !YT_out) {
         fprintf(stderr, "ERR: alloc work buffers\n");
-        free(YT_out); free(S5_out); free(Ravg_buf); free(R_buf);
-        free(ta_out); free(ta_combined); free(chan_buf); free(lpf_f32); free(raw_f32);
-        free(S.avg_tail); free(S.lpf_state);
+        free(YT_out); free(S5_out);
+        free(ta_out); free(raw_f32);
+        free(S.ma_hist); free(S.ta_acc); free(S.lpf_state);
         iio_buffer_destroy(buf); free(in_ch); free(scales); iio_context_destroy(ctx);
         return 10;
     }
@@ -446,71 +555,56 @@ int main(int argc, char **argv) {
     // ---------- Main loop ----------
     for (;;) {
         check_and_process_stdin(&P);
+        if (P.lpf_cutoff_hz != sos_cutoff_hz) {
+            // runtime cutoff change: redesign in place, re-prime states at the next block's first sample
+            butter_lowpass_sos(P.sampling_frequency, P.lpf_cutoff_hz, n_sections, sos_design);
+            sos_cutoff_hz = P.lpf_cutoff_hz;
+            S.lpf_primed = 0;
+        }
         if (iio_buffer_refill(buf) < 0) { fprintf(stderr, "ERR: buffer refill\n"); break; }
 
-        // 1) raw → float (interleaved)
-        for (int ci = 0; ci < n_in; ci++) {
+        // 1) raw → float (interleaved, row stride n_ch → no unused columns between samples)
+        //    only the n_ch channels the quad pipeline reads are converted; extra inputs stay enabled but unread
+        for (int ci = 0; ci < n_ch; ci++) {
             struct iio_channel *ch = in_ch[ci];
             const uint8_t *p = (const uint8_t *)iio_buffer_first(buf, ch);
             const ptrdiff_t step = iio_buffer_step(buf);
-            const double s = scales[ci];
+            // float32 end-to-end: 20-bit ADC codes are exact in float, scale once in float
+            const float s = (float)scales[ci];
             float *dst = raw_f32 + (size_t)ci;
             for (int k = 0; k < block_samples; k++) {
                 int64_t v = 0; iio_channel_convert(ch, &v, p);
-                *dst = (float)(v * s);
-                dst += n_in;
+                *dst = (float)v * s;
+                dst += n_ch;
                 p   += step;
             }
         }
 
-        // 2) LPF per channel (in-place over chan_buf) → lpf_f32
-        memcpy(lpf_f32, raw_f32, sizeof(float) * (size_t)block_samples * (size_t)n_in);
-
-         for (int c = 0; c < n_ch; c++) {
-             const float *src = raw_f32 + (size_t)c;
-             for (int i = 0; i < block_samples; i++) chan_buf[i] = src[(size_t)i * (size_t)n_in];
-             sos_df2t_inplace(chan_buf, block_samples, sos, n_sections, S.lpf_state + (size_t)c * (size_t)(n_sections*2));
-             float *dst = lpf_f32 + (size_t)c;
-             for (int i = 0; i < block_samples; i++) dst[(size_t)i * (size_t)n_in] = chan_buf[i];
+        // 2) LPF, all channels per sample row, in place on raw_f32
+         if (!S.lpf_primed) {
+             for (int c = 0; c < n_ch; c++)
+                 sos_df2t_init_steady(sos, n_sections, S.lpf_state + (size_t)c * (size_t)(n_sections*2), (double)raw_f32[c]);
+             S.lpf_primed = 1;
          }
-
-        // ❗ [추가] 2-2) Smoothing Filter (CH Moving Average) per channel
-        for (int c = 0; c < n_ch; c++) {
-            const float *src = lpf_f32 + (size_t)c;
-            for (int i = 0; i < block_samples; i++) chan_buf[i] = src[(size_t)i * (size_t)n_in];
-            
-            moving_average_f32(chan_buf, chan_buf, block_samples, movavg_ch); // ❗ 이동 평균 적용
-            
-            float *dst = ma_ch_out + (size_t)c;
-            for (int i = 0; i < block_samples; i++) dst[(size_t)i * (size_t)n_in] = chan_buf[i];
-        }
-
-        // 3) TimeAverage (tail + current) → ta_out [n_ta x n_ch]
-        const int total = S.avg_tail_len + block_samples;
-        if (S.avg_tail_len > 0) {
-            memcpy(ta_combined, S.avg_tail, (size_t)S.avg_tail_len * (size_t)n_ch * sizeof(float));
-        }
-        memcpy(ta_combined + (size_t)S.avg_tail_len * (size_t)n_ch,
-               ma_ch_out, (size_t)block_samples * (size_t)n_ch * sizeof(float));
-
-        const int n_ta = total / decim;
-        const int rem  = total % decim;
-
-        for (int o = 0; o < n_ta; o++) {
-            for (int c = 0; c < n_ch; c++) {
-                double acc = 0.0;
-                const int base = o * decim;
-                const float *ptr = ta_combined + (size_t)base * (size_t)n_ch + (size_t)c;
-                for (int u = 0; u < decim; u++) acc += ptr[(size_t)u * (size_t)n_ch];
-                ta_out[o * n_ch + c] = (float)(acc / (double)decim);
+         sos_df2t_multi(raw_f32, raw_f32, block_samples, n_ch, n_ch, sos, n_sections, S.lpf_state);
+
+        // ❗ 2-2) Smoothing Filter (CH Moving Average) + 3) TimeAverage in one pass
+        //    CH MA (블록 경계 연속) 출력을 중간 버퍼 없이 바로 per-channel TA 합에 누적 → ta_out [n_ta x n_ch]
+        //    (no tail copy; each LPF sample is read exactly once)
+        int n_ta = 0;
+        for (int i = 0; i < block_samples; i++) {
+            const float *row = raw_f32 + (size_t)i * (size_t)n_ch;
+            for (int c = 0; c < n_ch; c++) S.ta_acc[c] += (double)running_mean_push(&S.ma_ch[c], row[c]);
+            if (++S.ta_count == decim) {
+                float *dst = ta_out + (size_t)n_ta * (size_t)n_ch;
+                for (int c = 0; c < n_ch; c++) {
+                    dst[c] = (float)(S.ta_acc[c] / (double)decim);
+                    S.ta_acc[c] = 0.0;
+                }
+                S.ta_count = 0;
+                n_ta++;
             }
         }
-        S.avg_tail_len = rem;
-        if (rem > 0) {
-            memcpy(S.avg_tail,
-                   ta_combined + (size_t)n_ta * (size_t)decim * (size_t)n_ch,
-                   (size_t)rem * (size_t)n_ch * sizeof(float));
-        }
 
         // ---- Stage3 frame emit (8ch) ----
         if (n_ta > 0) {
@@ -524,38 +618,24 @@ int main(int argc, char **argv) {
 
         // 4) Stage5 (Ravg 4ch) & Stage9 (YT 4ch)
         if (n_ta > 0) {
-            // For each quad, compute R and Ravg, then y-chain and yt
-            for (int q = 0; q < 4; q++) {
-                const int si = sensor_idx[q];
-                const int bi = standard_idx[q];
-
-                // R at TA rate
-                for (int t = 0; t < n_ta; t++) {
-                    double top = (double)ta_out[t * n_ch + si];
-                    double bot = (double)ta_out[t * n_ch + bi];
+            // Row-major over TA rows: each row's 8 channels are read once for all four quads,
+            // then R → Ravg (running mean across blocks) → Stage5, y1 → y2 → y3 → yt
+            for (int t = 0; t < n_ta; t++) {
+                const float *row = ta_out + (size_t)t * (size_t)n_ch;
+                for (int q = 0; q < 4; q++) {
+                    double top = (double)row[sensor_idx[q]];
+                    double bot = (double)row[standard_idx[q]];
                     if (P.r_abs) { if (top < 0) top = -top; if (bot < 0) bot = -bot; }
                     if (top < 1e-12) top = 1e-12;
                     if (bot < 1e-12) bot = 1e-12;
                     const double ratio = top / bot;
-                    const double log_ratio = log(ratio) * inv_log_b; // log()/log(base)
-                    R_buf[t] = (float)(r_scale * log_ratio + P.b);
-                }
-                // Ravg
-                moving_average_f32(R_buf, Ravg_buf, n_ta, P.movavg_r);
-
-                // Stage5 output (Ravg)
-                for (int t = 0; t < n_ta; t++) {
-                    S5_out[t * 4 + q] = Ravg_buf[t];
-                }
+                    const float ravg = running_mean_push(&S.ravg[q], (float)(r_gain * log(ratio) + P.b));
+                    S5_out[t * 4 + q] = ravg;
 
-                // Stage9: y1..yt
-                for (int t = 0; t < n_ta; t++) {
-                    const double r = (double)Ravg_buf[t];
-                    const double y1n = polyval_f64(P.y1_num, P.y1_num_len, r);
-                    const double y1d = polyval_f64(P.y1_den, P.y1_den_len, r);
-                    const double y1  = y1n / ((fabs(y1d) < 1e-12) ? 1e-12 : y1d);
-                    const double y2  = polyval_f64(P.y2_coeffs, P.y2_coeffs_len, y1);
-                    const double y3  = polyval_f64(P.y3_coeffs, P.y3_coeffs_len, y2);
+                    const double r = (double)ravg;
+                    const double y1  = polyfrac_estrin_f64(P.y1_num, P.y1_num_len, P.y1_den, P.y1_den_len, r);
+                    const double y2  = polyval_estrin_f64(P.y2_coeffs, P.y2_coeffs_len, y1);
+                    const double y3  = polyval_estrin_f64(P.y3_coeffs, P.y3_coeffs_len, y2);
                     Y2_out[t * 4 + q] = (float)y2;
                     Y3_out[t * 4 + q] = (float)y3;
                     YT_out[t * 4 + q] = (float)(P.E * y3 + P.F);
@@ -608,60 +688,77 @@ int main(int argc, char **argv) {
            // UART 로그 출력
             #ifdef _WIN32
                     if (uart_h != INVALID_HANDLE_VALUE) {
-                        char buffer[256];
+                        // 블록의 모든 행을 모아 WriteFile 한 번으로 전송
+                        char buffer[4096];
+                        size_t ulen = 0;
+                        DWORD bytes_written;
                         for (int t = 0; t < n_ta; t++) {
-                            int len = snprintf(buffer, sizeof(buffer), "YT[%d] = %.3f, %.3f, %.3f, %.3f\r\n",
+                            if (sizeof(buffer) - ulen < 256) {
+                                WriteFile(uart_h, buffer, (DWORD)ulen, &bytes_written, NULL);
+                                ulen = 0;
+                            }
+                            int len = snprintf(buffer + ulen, sizeof(buffer) - ulen, "YT[%d] = %.3f, %.3f, %.3f, %.3f\r\n",
                                 t, YT_out[t*4+0], YT_out[t*4+1], YT_out[t*4+2], YT_out[t*4+3]);
-                            DWORD bytes_written;
-                            WriteFile(uart_h, buffer, (DWORD)len, &bytes_written, NULL);
+                            if (len > 0) ulen += ((size_t)len < sizeof(buffer) - ulen) ? (size_t)len : sizeof(buffer) - ulen - 1;
                         }
+                        if (ulen > 0) WriteFile(uart_h, buffer, (DWORD)ulen, &bytes_written, NULL);
                     }
             #else
             
                     static FILE* logf = NULL;   // 실행 중 계속 유지되는 파일 포인터
                     if (uart_fd >= 0) {
-                        for (int t = 0; t < n_ta; t++) {
-                            struct timeval tv;
-                            gettimeofday(&tv, NULL);
-
-                            struct tm* tm_info = localtime(&tv.tv_sec);
-                            char time_buf[64];
-                            strftime(time_buf, sizeof(time_buf), "%Y-%m-%d %H:%M:%S", tm_info);
+                        // 블록 단위 타임스탬프: 한 블록의 행들은 같은 ms 안에서 계산됨
+                        struct timeval tv;
+                        gettimeofday(&tv, NULL);
+                        struct tm* tm_info = localtime(&tv.tv_sec);
+                        char time_buf[64];
+                        strftime(time_buf, sizeof(time_buf), "%Y-%m-%d %H:%M:%S", tm_info);
+                        const long ms = (long)(tv.tv_usec / 1000);
+
+                        if (!logf) {
+                            // 프로그램 시작 시 한 번만 파일 열기 (+ 블록 단위로 모아 쓰는 버퍼)
+                            logf = fopen("yt_log.csv", "a");
+                            if (!logf) {
+                                perror("fopen(yt_log.csv)");
+                            } else {
+                                setvbuf(logf, NULL, _IOFBF, 1 << 16);
+                            }
+                        }
 
-                            // 1) UART 출력    
-                            dprintf(uart_fd,
+                        char uart_buf[4096];     // 블록의 UART 행을 모아 write() 한 번으로 전송
+                        size_t ulen = 0;
+                        for (int t = 0; t < n_ta; t++) {
+                            // 1) UART 출력 — 버퍼에 누적
+                            if (sizeof(uart_buf) - ulen < 256) {
+                                uart_write_all(uart_fd, uart_buf, ulen);
+                                ulen = 0;
+                            }
+                            const int len = snprintf(uart_buf + ulen, sizeof(uart_buf) - ulen,
                                 "%s.%03ld,%.3f,%.3f,%.3f,%.3f\r\n",
-                                time_buf, tv.tv_usec / 1000,
+                                time_buf, ms,
                                 YT_out[t*4+0], YT_out[t*4+1],
                                 YT_out[t*4+2], YT_out[t*4+3]);
+                            if (len > 0) ulen += ((size_t)len < sizeof(uart_buf) - ulen) ? (size_t)len : sizeof(uart_buf) - ulen - 1;
 
-                            // 2) CSV 파일 저장 (보드 내부 log.csv)
-                            if (!logf) {
-                                // 프로그램 시작 시 한 번만 파일 열기
-                                logf = fopen("yt_log.csv", "a");
-                                if (!logf) {
-                                    perror("fopen(yt_log.csv)");
-                                }
-                            }
-
+                            // 2) CSV 파일 저장 (보드 내부 log.csv) — 버퍼에 누적
                             if (logf) {
                                 fprintf(logf, "%s.%03ld,%.3f,%.3f,%.3f,%.3f\n",
-                                    time_buf, tv.tv_usec / 1000,
+                                    time_buf, ms,
                                     YT_out[t*4+0], YT_out[t*4+1],
                                     YT_out[t*4+2], YT_out[t*4+3]);
-
-                                fflush(logf);  // 버퍼에 쌓이지 않도록 즉시 디스크 반영
                             }
                         }
+                        if (ulen > 0) uart_write_all(uart_fd, uart_buf, ulen);
+                        if (logf) fflush(logf);  // 블록당 한 번만 디스크 반영
                     }
             #endif
            
         } 
     }    
     // ---------- Cleanup ----------
-    free(Y3_out); free(Y2_out); free(YT_out); free(S5_out); free(Ravg_buf); free(R_buf);
-    free(ta_out); free(ta_combined); free(chan_buf); free(lpf_f32); free(raw_f32);
-    free(S.avg_tail); free(S.lpf_state);
+    free(Y3_out); free(Y2_out); free(YT_out); free(S5_out);
+    free(ta_out); free(raw_f32);
+    free(S.ma_hist); free(S.ta_acc); free(S.lpf_state);
     iio_buffer_destroy(buf);
     free(in_ch); free(scales);
     iio_context_destroy(ctx);
@@ -1,19 +1,33 @@
 # generate_sos.py
+# iio_reader.c는 기동 시(그리고 lpf_cutoff_hz 명령 시) butter_lowpass_sos()로 SOS를 직접 설계함
+# → 이 스크립트는 붙여넣기용이 아니라, 같은 (fs, fc)에서 C가 계산하는 계수/응답을 확인하는 참고용
+import sys
 from scipy import signal
 import numpy as np
 
-# --- 설정값 ---
-fs = 1000000      # C 코드의 현재 샘플링 주파수 (Hz)
-fc = 2500         # C 코드에 설정된 차단 주파수 (Hz)
-order = 4         # 필터 차수
+# --- 설정값 (pipeline.PipelineParams 기본값과 동일, 인자로 덮어쓰기: fs fc) ---
+fs = float(sys.argv[1]) if len(sys.argv) > 1 else 100000   # iio_reader <fs> 인자 (Hz)
+fc = float(sys.argv[2]) if len(sys.argv) > 2 else 2500     # iio_reader <lpf_cutoff> 인자 (Hz)
+order = 4         # 필터 차수 (C: n_sections = 2)
 
 # 버터워스 필터의 SOS(Second-Order Sections) 계수 계산
 sos = signal.butter(order, fc, btype='low', analog=False, output='sos', fs=fs)
 
-# --- C 코드에 붙여넣을 형식으로 출력 ---
-print("const double sos[4][6] = {")
+# C 설계와 같은 정규화: scipy는 전체 이득을 첫 섹션에 몰지만, C는 섹션마다 DC 이득 1
+# (전체 응답은 동일, 섹션 순서도 scipy와 같음)
+for section in sos:
+    b, a = section[:3], section[3:]
+    section[:3] = b * (a.sum() / b.sum())
+
+# --- C 코드(butter_lowpass_sos 결과)와 같은 형식으로 출력 ---
+print(f"// fs = {fs:g} Hz, fc = {fc:g} Hz, order = {order}")
+print(f"double sos[{len(sos)}][6] = {{")
 for section in sos:
     # 각 숫자를 과학적 표기법(e-notation)으로 변환하여 C 코드와 형식을 맞춤
     formatted_section = ", ".join([f"{val:.6e}" for val in section])
     print(f"    {{{formatted_section}}},")
-print("};")
\ No newline at end of file
+print("};")
+
+# -3 dB 지점 확인 (설계 차단 주파수와 같아야 함)
+w, h = signal.sosfreqz(sos, worN=1 << 16, fs=fs)
+print(f"// -3 dB at {w[np.argmax(np.abs(h) < 10 ** (-3 / 20))]:.1f} Hz")
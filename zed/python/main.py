@@ -6,14 +6,33 @@
 # ============================================================
 
 import argparse
+import csv
+import functools
+import os
+import queue
 import time
 import threading
 from collections import deque
 import numpy as np
-import pandas as pd
-from scipy.signal import butter, sosfilt, sosfiltfilt
+from scipy.signal import butter, sosfilt, sosfilt_zi
 import matplotlib.pyplot as plt
 
+# Numba는 선택 의존성: 없으면 NumPy/SciPy 단계별 경로로 동작
+# 컴파일 캐시는 스크립트 옆 고정 경로에 저장 → 재실행 시 JIT 비용 없음
+os.environ.setdefault("NUMBA_CACHE_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), ".numba_cache"))
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# pyarrow도 선택 의존성: 없으면 PARQUET_PATH 대신 CSV로 기록 (main에서 경고 출력)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 # ============================================================
 # [설정값] Config
 # ============================================================
@@ -21,8 +40,11 @@ FS_HZ_DEFAULT      = 100_000        # 기본 샘플링 속도 (synthetic 모드
 BLOCK_SAMPLES      = 4096           # 한 번에 읽어오는 샘플 개수
 ROLLING_WINDOW_SEC = 5.0            # 화면에 표시할 롤링 윈도우 시간 (초 단위)
 CSV_PATH           = "stream_log.csv"  # 로그 저장 경로
-PARQUET_PATH       = None              # Parquet 저장 (옵션)
+PARQUET_PATH       = None              # Parquet 저장 (옵션, pyarrow 필요)
+PARQUET_ROW_GROUP  = 256               # Parquet row group 당 행 수
 SAVE_EVERY_BLOCKS  = 5                 # N 블록마다 CSV 저장
+CSV_FLUSH_EVERY    = 20                # N 행마다 CSV 버퍼 flush
+RAW_QUEUE_BLOCKS   = 4                 # 획득→처리 스레드 사이 원시 블록 큐 깊이
 
 # 필터/보정 관련 파라미터
 LPF_CUTOFF_HZ      = 5_000          # LPF 컷오프 (Hz)
@@ -37,65 +59,221 @@ IIO_DTYPE          = np.int32       # IIO raw buffer 언팩 시 데이터 타입
 # ============================================================
 # [필터 및 보정 함수]
 # ============================================================
-def moving_average(x: np.ndarray, N: int) -> np.ndarray:
-    """N 포인트 이동평균"""
+def moving_average(x: np.ndarray, N: int, hist=None):
+    """N 포인트 이동평균 (후행 정렬: y[i] = mean(x[i-N+1..i]), 누적합 1회).
+    hist(직전 입력의 마지막 N-1개)를 주면 (y, 새 hist)를 반환해 블록 간 롤링 합을 잇는다 (없으면 0 패딩)"""
     if N is None or N <= 1:
-        return x
-    c = np.ones(N, dtype=float) / float(N)
-    return np.convolve(x, c, mode='same')
+        return x if hist is None else (x, hist)
+    x = np.asarray(x, dtype=np.result_type(np.asarray(x).dtype, np.float32))
+    prev = np.zeros(N - 1, dtype=x.dtype) if hist is None else hist
+    xx = np.concatenate((prev, x))
+    cs = np.cumsum(xx, dtype=np.float64)
+    y = cs[N - 1:].copy()
+    y[1:] -= cs[:-N]
+    y = (y / N).astype(x.dtype)
+    if hist is None:
+        return y
+    return y, xx[-(N - 1):].copy()
+
+@functools.lru_cache(maxsize=64)
+def _lpf_design(fs_int: int, cutoff_int: int, order: int):
+    """Butterworth LPF 설계 캐시 → (sos, zi_unit) float32. 키는 정수 Hz로 양자화"""
+    nyq = 0.5 * fs_int
+    wn = np.clip(cutoff_int / nyq, 1e-6, 0.999999)
+    sos = butter(order, wn, btype='low', output='sos').astype(np.float32)
+    # 단위 계단 정상상태 (n_sections, 2): 설계당 한 번만 계산
+    return sos, sosfilt_zi(sos).astype(np.float32)
+
+def lpf_design(fs_hz: float, cutoff_hz: float, order: int = 4):
+    """fs/cutoff를 1 Hz 단위로 양자화해 캐시 조회 (같은 설계 반복 요청은 캐시 적중)"""
+    return _lpf_design(int(round(fs_hz)), int(round(cutoff_hz)), int(order))
 
 def design_lpf(fs_hz: float, cutoff_hz: float, order: int = 4):
-    """Butterworth LPF 설계 (sos 반환)"""
-    nyq = 0.5 * fs_hz
-    wn = np.clip(cutoff_hz / nyq, 1e-6, 0.999999)
-    return butter(order, wn, btype='low', output='sos')
+    """Butterworth LPF 설계 (float32 sos 반환, 캐시 공유 → 수정 금지)"""
+    return lpf_design(fs_hz, cutoff_hz, order)[0]
 
-def apply_lpf(x: np.ndarray, sos, zero_phase: bool = False) -> np.ndarray:
-    """LPF 적용 (filt 또는 filtfilt)"""
-    return sosfiltfilt(sos, x) if zero_phase else sosfilt(sos, x)
+def apply_lpf(x: np.ndarray, sos, zi=None):
+    """LPF 적용 (인과 sosfilt). zi를 주면 (y, zf)를 반환해 블록 간 상태를 잇는다"""
+    if zi is None:
+        return sosfilt(sos, x)
+    return sosfilt(sos, x, zi=zi)
 
 def apply_poly(x: np.ndarray, coeffs):
-    """다항식 보정 적용 (없으면 통과)"""
-    if coeffs is None:
+    """다항식 보정 적용 (없으면 통과). coeffs는 최고차항 우선, Horner 제자리 연산"""
+    if coeffs is None or len(coeffs) == 0:
         return x
-    p = np.poly1d(coeffs)
-    return p(x)
+    out = np.full(np.shape(x), coeffs[0], dtype=np.result_type(np.asarray(x).dtype, np.float32))
+    for ck in coeffs[1:]:
+        np.multiply(out, x, out=out)
+        np.add(out, ck, out=out)
+    return out
+
+if njit is not None:
+    @njit(inline='always')
+    def _ma_drop(x, hist, c, i, N):
+        """출력 i의 윈도우 [i-N+1, i]에서 다음 출력 전에 빠질 샘플 (블록 앞부분은 이전 블록 꼬리 hist)"""
+        j = i - N + 1
+        if j >= 0:
+            return x[j, c]
+        return hist[j + N - 1, c]
+
+    @njit(inline='always')
+    def _horner(poly_c, v):
+        """poly_c(최고차항 우선)가 비어 있으면 통과"""
+        if poly_c.shape[0] == 0:
+            return v
+        p = poly_c[0]
+        for k in range(1, poly_c.shape[0]):
+            p = p * v + poly_c[k]
+        return p
+
+    # 명시 시그니처(float32, C-연속) → import 시 eager 컴파일, 호출 시 타입 디스패치 없음
+    @njit("void(f4[:, ::1], i8, f4[:, ::1], f4[:, ::1], f4[:, :, ::1], f4[::1], f4[:, ::1])",
+          parallel=True, fastmath=True, cache=True, nogil=True)
+    def _process_fused(x, N, hist, sos, zi, poly_c, out):
+        """MA + SOS(DF2T) + 다항식 보정을 샘플 단위 한 번의 루프로 처리.
+
+        x/out: (n_samples, n_ch), hist: (N-1, n_ch) 직전 입력 꼬리,
+        zi: (n_sections, 2, n_ch) — hist/zi는 호출 후 갱신됨.
+        MA 정렬은 moving_average(hist=...)와 동일 (후행, 롤링 합이 블록 간 이어짐).
+        2-섹션(LPF_ORDER=4)은 계수/상태를 지역 변수로 풀어 섹션 루프를 없앤다.
+        """
+        n, n_ch = x.shape
+        n_sec = sos.shape[0]
+        for c in prange(n_ch):
+            acc = 0.0
+            for k in range(N - 1):
+                acc += hist[k, c]
+            if n_sec == 2:
+                b0, b1, b2, a1, a2 = sos[0, 0], sos[0, 1], sos[0, 2], sos[0, 4], sos[0, 5]
+                d0, d1, d2, e1, e2 = sos[1, 0], sos[1, 1], sos[1, 2], sos[1, 4], sos[1, 5]
+                z1, z2 = zi[0, 0, c], zi[0, 1, c]
+                w1, w2 = zi[1, 0, c], zi[1, 1, c]
+                for i in range(n):
+                    acc += x[i, c]
+                    v = acc / N
+                    acc -= _ma_drop(x, hist, c, i, N)
+                    y = b0 * v + z1
+                    z1 = b1 * v - a1 * y + z2
+                    z2 = b2 * v - a2 * y
+                    u = d0 * y + w1
+                    w1 = d1 * y - e1 * u + w2
+                    w2 = d2 * y - e2 * u
+                    out[i, c] = _horner(poly_c, u)
+                zi[0, 0, c], zi[0, 1, c] = z1, z2
+                zi[1, 0, c], zi[1, 1, c] = w1, w2
+            else:
+                for i in range(n):
+                    acc += x[i, c]
+                    v = acc / N
+                    acc -= _ma_drop(x, hist, c, i, N)
+                    for s in range(n_sec):
+                        y = sos[s, 0] * v + zi[s, 0, c]
+                        zi[s, 0, c] = sos[s, 1] * v - sos[s, 4] * y + zi[s, 1, c]
+                        zi[s, 1, c] = sos[s, 2] * v - sos[s, 5] * y
+                        v = y
+                    out[i, c] = _horner(poly_c, v)
+            # 다음 블록용 꼬리 N-1개 (n < N-1이면 앞으로 밀고 채움; 읽는 위치가 항상 쓰는 위치 이상)
+            for k in range(N - 1):
+                src = n - (N - 1) + k
+                hist[k, c] = x[src, c] if src >= 0 else hist[src + N - 1, c]
+else:
+    _process_fused = None
 
 class DisplayAverager:
-    """숫자 표시를 위한 블록 단위 롤링 평균"""
+    """숫자 표시를 위한 블록 단위 롤링 평균 (고정 링버퍼 + 누적합, O(1) 갱신)"""
     def __init__(self, n: int):
-        self.buf = deque(maxlen=max(1, int(n)))
+        self.n = max(1, int(n))
+        self._buf = np.zeros(self.n, dtype=np.float64)
+        self._sum = 0.0
+        self._idx = 0
+        self._filled = 0
     def update(self, value: float) -> float:
-        self.buf.append(float(value))
-        return float(np.mean(self.buf))
+        v = float(value)
+        # 밀려나는 값(미충전 구간은 0)을 빼고 새 값을 더함
+        self._sum += v - float(self._buf[self._idx])
+        self._buf[self._idx] = v
+        self._idx = (self._idx + 1) % self.n
+        self._filled = min(self._filled + 1, self.n)
+        return self._sum / self._filled
+
+class ParquetLog:
+    """Parquet 로그 (pyarrow). 행을 모아 row group 단위로 한 번에 기록"""
+    def __init__(self, path: str, row_group: int = PARQUET_ROW_GROUP):
+        self._pa = pa
+        self.schema = pa.schema([("timestamp", pa.float64()), ("value", pa.float64())])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group = max(1, int(row_group))
+        self._ts: list[float] = []
+        self._val: list[float] = []
+
+    def append(self, ts: float, value: float):
+        self._ts.append(ts)
+        self._val.append(value)
+        if len(self._ts) >= self.row_group:
+            self.flush()
+
+    def flush(self):
+        if not self._ts:
+            return
+        batch = self._pa.RecordBatch.from_arrays(
+            [self._pa.array(self._ts, self._pa.float64()), self._pa.array(self._val, self._pa.float64())],
+            schema=self.schema)
+        self.writer.write_batch(batch)
+        self._ts.clear()
+        self._val.clear()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
 
 # ============================================================
 # [데이터 소스] Synthetic / IIO
 # ============================================================
 class SyntheticSource:
-    """테스트용 합성 신호 발생기"""
+    """테스트용 합성 신호 발생기 (작업 버퍼는 한 번만 할당)"""
+    realtime = False  # 처리 속도에 맞춰 생성 (블록 폐기 없음)
+
     def __init__(self, fs_hz: float, f_sig: float = 3e3, snr_db: float = 20.0):
         self.fs = fs_hz
         self.f = f_sig
         self.n = 0
         self.snr_db = snr_db
+        self._rng = np.random.default_rng()
+        self._alloc(0)
+
+    def _alloc(self, n_samples: int):
+        self._idx = np.arange(n_samples, dtype=np.float64)
+        self._phase = np.empty(n_samples, dtype=np.float64)  # 위상은 float64 (n 누적 정밀도)
+        self._sig = np.empty(n_samples, dtype=np.float32)
+        self._noise = np.empty(n_samples, dtype=np.float32)
+
     def read_block(self, n_samples: int) -> np.ndarray:
-        t = (np.arange(n_samples) + self.n) / self.fs
+        if self._idx.shape[0] != n_samples:
+            self._alloc(n_samples)
+        np.add(self._idx, self.n, out=self._phase)
+        self._phase *= 2*np.pi*self.f/self.fs
         self.n += n_samples
-        sig = np.sin(2*np.pi*self.f*t)
+        np.sin(self._phase, out=self._sig)
         # SNR 맞춰 잡음 추가
-        p_sig = np.mean(sig**2)
+        p_sig = float(np.dot(self._sig, self._sig)) / max(1, n_samples)
         p_n = p_sig / (10.0 ** (self.snr_db/10.0))
-        noise = np.random.normal(scale=np.sqrt(p_n), size=n_samples)
-        return sig + noise
+        self._rng.standard_normal(dtype=np.float32, out=self._noise)
+        self._noise *= np.float32(np.sqrt(p_n))
+        # 반환 블록은 새 배열 (소비 측이 보관해도 다음 호출에 덮어쓰이지 않음)
+        return np.add(self._sig, self._noise)
 
 class IIOSource:
     """IIO 장치로부터 신호 읽기 (pyadi-iio → pylibiio fallback)"""
+    realtime = True  # 하드웨어 속도로 도착 → 처리가 밀리면 오래된 블록 폐기
+
     def __init__(self, uri: str, device_hint: str | None = None, channel_hint: str | None = None):
         self.uri = uri
         self.device_hint = device_hint
         self.channel_hint = channel_hint
         self.mode = None
+        self._buf = None     # pylibiio 버퍼 (블록 크기가 바뀔 때만 재생성)
+        self._buf_n = 0
         self._init_backend()
 
     def _init_backend(self):
@@ -147,23 +325,24 @@ class IIOSource:
     def read_block(self, n_samples: int) -> np.ndarray:
         """n_samples 크기 블록 읽기"""
         if self.mode == "pyadi":
-            arrs = []
-            for ch in self._adi_chs:
-                try:
-                    raw = ch.read_raw(n_samples)
-                    arr = np.frombuffer(raw, dtype=IIO_DTYPE)
-                except Exception:
-                    arr = np.zeros(n_samples, dtype=IIO_DTYPE)
-                arrs.append(arr[:n_samples])
-            return arrs[0].astype(float) if arrs else np.zeros(n_samples, dtype=float)
+            # 처리/표시는 첫 채널만 사용하므로 첫 채널만 읽는다
+            if not self._adi_chs:
+                return np.zeros(n_samples, dtype=np.float32)
+            try:
+                raw = self._adi_chs[0].read_raw(n_samples)
+                arr = np.frombuffer(raw, dtype=IIO_DTYPE)[:n_samples]
+            except Exception:
+                return np.zeros(n_samples, dtype=np.float32)
+            return arr.astype(np.float32)
         else:
-            import iio
-            buf = iio.Buffer(self.dev, n_samples, cyclic=False)
-            buf.refill()
-            ch = self.channels[0]
-            raw = ch.read(buf)
-            arr = np.frombuffer(raw, dtype=IIO_DTYPE)
-            return arr.astype(float)
+            if self._buf is None or self._buf_n != n_samples:
+                import iio
+                self._buf = iio.Buffer(self.dev, n_samples, cyclic=False)
+                self._buf_n = n_samples
+            self._buf.refill()
+            raw = self.channels[0].read(self._buf)
+            # frombuffer는 복사 없음 → astype 한 번으로 변환
+            return np.frombuffer(raw, dtype=IIO_DTYPE).astype(np.float32)
 
 # ============================================================
 # [처리기 Processor]
@@ -173,18 +352,82 @@ class Processor:
     def __init__(self, fs_hz: float):
         self.fs = fs_hz
         self.lock = threading.Lock()
-        self.sos = design_lpf(self.fs, LPF_CUTOFF_HZ, LPF_ORDER)
+        self.sos, self._zi_unit = lpf_design(self.fs, LPF_CUTOFF_HZ, LPF_ORDER)
+        self.zi = None  # 블록 간 LPF 상태 (첫 블록에서 초기화)
+        self.ma_n = max(1, MOVING_AVG_N or 1)
+        self._ma_hist = None  # 블록 간 이동평균 이력: 직전 입력의 마지막 N-1개 (첫 블록에서 초기화)
+        # 보정 계수는 상수 → 한 번만 float32(최고차항 우선)로 변환, 두 경로가 같은 배열 사용
+        self._poly_c = np.asarray(POLY_COEFFS if POLY_COEFFS is not None else [], dtype=np.float32)
         self.display_avg = DisplayAverager(TIME_AVG_SAMPLES)
-        self.roll = deque(maxlen=int(self.fs*ROLLING_WINDOW_SEC))
+        # 롤링 윈도우: 고정 크기 링버퍼 + 쓰기 인덱스 (플롯은 fp32로 충분)
+        self.roll = np.empty(max(1, int(self.fs*ROLLING_WINDOW_SEC)), dtype=np.float32)
+        self.widx = 0
+        self.filled = 0
+        self.n_pushed = 0  # 누적 샘플 수 (블록 극값의 윈도우 이탈 판정용)
+        # 블록 단위 단조 deque: (극값, 블록 끝 샘플 번호) → 윈도우 min/max를 O(1)로 조회
+        self._blk_min = deque()
+        self._blk_max = deque()
         self.block_counter = 0
 
+    def _push_roll(self, y: np.ndarray):
+        """링버퍼에 블록 기록 (최대 두 구간 복사)"""
+        L = self.roll.shape[0]
+        y = y[-L:]
+        k = y.shape[0]
+        end = min(L, self.widx + k)
+        n1 = end - self.widx
+        self.roll[self.widx:end] = y[:n1]
+        self.roll[:k - n1] = y[n1:]
+        self.widx = (self.widx + k) % L
+        self.filled = min(L, self.filled + k)
+        self._push_extent(y)
+
+    def _push_extent(self, y: np.ndarray):
+        """블록 min/max를 단조 deque에 추가하고 윈도우를 완전히 벗어난 블록은 제거"""
+        self.n_pushed += y.shape[0]
+        lo, hi = float(y.min()), float(y.max())
+        while self._blk_min and self._blk_min[-1][0] >= lo:
+            self._blk_min.pop()
+        self._blk_min.append((lo, self.n_pushed))
+        while self._blk_max and self._blk_max[-1][0] <= hi:
+            self._blk_max.pop()
+        self._blk_max.append((hi, self.n_pushed))
+        start = self.n_pushed - self.roll.shape[0]
+        while self._blk_min[0][1] <= start:
+            self._blk_min.popleft()
+        while self._blk_max[0][1] <= start:
+            self._blk_max.popleft()
+
+    def roll_extent(self) -> tuple[float, float]:
+        """롤링 윈도우의 (min, max). 블록 단위라 윈도우 경계에 걸친 블록만큼 넓을 수 있음 (lock 안에서 호출)"""
+        return self._blk_min[0][0], self._blk_max[0][0]
+
+    def roll_snapshot(self) -> np.ndarray:
+        """시간 순서로 정렬된 롤링 윈도우 복사본 (lock 안에서 호출)"""
+        if self.filled < self.roll.shape[0]:
+            return self.roll[:self.filled].copy()
+        return np.concatenate((self.roll[self.widx:], self.roll[:self.widx]))
+
     def process(self, block: np.ndarray) -> tuple[np.ndarray, float]:
-        y = moving_average(block, MOVING_AVG_N)
-        y = apply_lpf(y, self.sos, zero_phase=False)
-        y = apply_poly(y, POLY_COEFFS)
+        if self._ma_hist is None:
+            # 이동평균 이력을 첫 샘플로 채움 → 첫 블록 앞에도 0 패딩 딥이 없음 (이후 블록은 실제 꼬리)
+            self._ma_hist = np.full(self.ma_n - 1, block[0], dtype=np.float32)
+        if self.zi is None:
+            # LPF 입력은 MA 출력 → 필터가 실제로 받을 첫 값(첫 MA 출력)의 정상상태에서 시작
+            v0 = (float(self._ma_hist.sum()) + float(block[0])) / self.ma_n
+            self.zi = self._zi_unit * np.float32(v0)
+        if _process_fused is not None:
+            block = np.ascontiguousarray(block, dtype=np.float32)  # 시그니처 고정: f4 C-연속
+            y = np.empty(block.shape[0], dtype=np.float32)
+            _process_fused(block.reshape(-1, 1), self.ma_n, self._ma_hist.reshape(-1, 1), self.sos,
+                           self.zi.reshape(self.zi.shape + (1,)), self._poly_c, y.reshape(-1, 1))
+        else:
+            y, self._ma_hist = moving_average(block, self.ma_n, hist=self._ma_hist)
+            y, self.zi = apply_lpf(y, self.sos, zi=self.zi)
+            y = apply_poly(y, self._poly_c)
         num_value = self.display_avg.update(np.mean(y))
         with self.lock:
-            self.roll.extend(y.tolist())
+            self._push_roll(y)
         return y, num_value
 
 # ============================================================
@@ -209,45 +452,154 @@ def main():
 
     proc = Processor(fs_hz=fs)
 
-    # Matplotlib 실시간 플롯 준비
+    # Matplotlib 실시간 플롯 준비 (line은 blit 전용 animated 아티스트)
     plt.ion()
     fig, ax = plt.subplots(figsize=(10,4))
-    line, = ax.plot([], [])
+    line, = ax.plot([], [], animated=True)
     ax.set_title("Realtime filtered signal")
     ax.set_xlabel("samples")
     ax.set_ylabel("amplitude")
 
-    # CSV 초기화
-    if CSV_PATH and not pd.io.common.file_exists(CSV_PATH):
-        pd.DataFrame(columns=["timestamp","value"]).to_csv(CSV_PATH, index=False)
-
-    def update_plot():
-        """롤링 버퍼 데이터로 그래프 갱신"""
-        with proc.lock:
-            data = np.array(proc.roll, dtype=float)
-        if data.size == 0: return
-        x = np.arange(len(data))
-        line.set_data(x, data)
-        ax.set_xlim(0, len(data))
-        ax.set_ylim(float(np.min(data)*1.1 if data.size else -1.0),
-                    float(np.max(data)*1.1 if data.size else 1.0))
-        fig.canvas.draw()
-        fig.canvas.flush_events()
+    # pyarrow가 없으면 Parquet 대신 CSV로 기록 (CSV_PATH가 꺼져 있으면 PARQUET_PATH 옆 .csv)
+    csv_path = CSV_PATH
+    if PARQUET_PATH and pq is None:
+        csv_path = csv_path or os.path.splitext(PARQUET_PATH)[0] + ".csv"
+        print(f"[WARN] pyarrow가 없어 Parquet 로그({PARQUET_PATH}) 대신 CSV({csv_path})에 기록합니다 (pip install pyarrow)")
+
+    # 실행 동안 열어 두는 버퍼링된 CSV 핸들 (행마다 open/close 하지 않음)
+    csv_fh = open(csv_path, "a", newline="", buffering=1 << 16) if csv_path else None
+    csv_w = csv.writer(csv_fh) if csv_fh else None
+    # CSV 초기화: 새(빈) 파일일 때만 헤더 기록 (append 모드는 파일 끝에서 시작)
+    if csv_fh and csv_fh.tell() == 0:
+        csv_w.writerow(("timestamp", "value"))
+    pq_log = ParquetLog(PARQUET_PATH) if PARQUET_PATH and pq is not None else None
+
+    # 획득 스레드 → 처리 스레드: 원시 블록 큐
+    #  - 실시간 소스(IIO): 가득 차면 가장 오래된 블록을 버려 refill을 막지 않음
+    #  - 합성 소스: 실시간 제약이 없으므로 처리 속도에 맞춰 대기
+    raw_q = queue.Queue(maxsize=RAW_QUEUE_BLOCKS)
+    # 처리 스레드 → GUI 스레드: 최신 롤링 스냅샷 1개만 전달
+    snap_q = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    drop_oldest = getattr(src, "realtime", False)
+    stats = {"dropped": 0}
 
-    # 메인 루프
-    while True:
-        block = src.read_block(BLOCK_SAMPLES).astype(float)
-        y, number_readout = proc.process(block)
-        print(f"\rRolling mean: {number_readout: .6f}", end="")
+    def acquire_loop():
+        """블록 획득 전용 (IIO refill 대기가 처리/플롯과 겹치도록)"""
+        while not stop.is_set():
+            # 소스가 이미 연속 float32를 주면 복사 없음 (백엔드 방어용)
+            block = np.ascontiguousarray(src.read_block(BLOCK_SAMPLES), dtype=np.float32)
+            while not stop.is_set():
+                try:
+                    if drop_oldest:
+                        raw_q.put_nowait(block)
+                    else:
+                        raw_q.put(block, timeout=0.1)
+                    break
+                except queue.Full:
+                    if drop_oldest:
+                        try:
+                            raw_q.get_nowait()
+                            stats["dropped"] += 1
+                        except queue.Empty:
+                            pass
+
+    def process_loop():
+        """처리 + 로그 저장 + 스냅샷 전달 (플롯 속도와 무관하게 동작)"""
+        csv_rows = 0
+        try:
+            while not stop.is_set():
+                try:
+                    block = raw_q.get(timeout=0.1)
+                except queue.Empty:
+                    if not acq.is_alive():
+                        break
+                    continue
+                y, number_readout = proc.process(block)
+                dropped = f"  dropped: {stats['dropped']}" if stats["dropped"] else ""
+                print(f"\rRolling mean: {number_readout: .6f}{dropped}", end="")
 
-        # 로그 저장
-        proc.block_counter += 1
-        if CSV_PATH and (proc.block_counter % SAVE_EVERY_BLOCKS == 0):
-            ts = time.time()
-            df = pd.DataFrame({"timestamp":[ts], "value":[float(number_readout)]})
-            df.to_csv(CSV_PATH, mode="a", header=False, index=False)
+                # 로그 저장
+                proc.block_counter += 1
+                if proc.block_counter % SAVE_EVERY_BLOCKS == 0:
+                    ts = time.time()
+                    if csv_w:
+                        csv_w.writerow((ts, float(number_readout)))
+                        csv_rows += 1
+                        if csv_rows % CSV_FLUSH_EVERY == 0:
+                            csv_fh.flush()
+                    if pq_log:
+                        pq_log.append(ts, float(number_readout))
+
+                with proc.lock:
+                    snap = (proc.roll_snapshot(), proc.roll_extent())
+                # 아직 그려지지 않은 이전 스냅샷은 버리고 최신 것으로 교체
+                try:
+                    snap_q.get_nowait()
+                except queue.Empty:
+                    pass
+                snap_q.put_nowait(snap)
+        finally:
+            if csv_fh:
+                csv_fh.close()
+            if pq_log:
+                pq_log.close()
+
+    # blit 상태: 축 범위가 바뀌거나 창이 다시 그려질 때만 배경 재캡처
+    x_axis = np.arange(proc.roll.shape[0])
+    view = {"xmax": None, "ylim": None, "bg": None}
+
+    def on_draw(_event):
+        view["bg"] = fig.canvas.copy_from_bbox(ax.bbox)
+
+    fig.canvas.mpl_connect("draw_event", on_draw)
+    fig.canvas.draw()
+
+    def update_plot(data: np.ndarray, extent: tuple[float, float]):
+        """롤링 스냅샷으로 그래프 갱신 (line 영역만 blit)"""
+        n = data.shape[0]
+        if n == 0: return
+        line.set_data(x_axis[:n], data)
+
+        # 축 범위는 벗어나거나 크게 줄었을 때만 변경 (hysteresis)
+        lo, hi = extent  # 처리 스레드가 블록마다 갱신한 극값 → 여기서 윈도우 전체를 다시 훑지 않음
+        relim = False
+        if view["xmax"] != n:
+            view["xmax"] = n
+            ax.set_xlim(0, n)
+            relim = True
+        ylim = view["ylim"]
+        if ylim is None or lo < ylim[0] or hi > ylim[1] or (hi - lo) < 0.5 * (ylim[1] - ylim[0]):
+            pad = 0.1 * max(hi - lo, 1e-9)
+            view["ylim"] = (lo - pad, hi + pad)
+            ax.set_ylim(*view["ylim"])
+            relim = True
+
+        if relim:
+            fig.canvas.draw()  # draw_event → 배경 재캡처 (animated line은 제외됨)
+        else:
+            fig.canvas.restore_region(view["bg"])
+        ax.draw_artist(line)
+        fig.canvas.blit(ax.bbox)
+        fig.canvas.flush_events()
 
-        update_plot()
+    # 메인 루프: GUI 스레드는 최신 스냅샷만 소비해서 그린다
+    acq = threading.Thread(target=acquire_loop, daemon=True)
+    worker = threading.Thread(target=process_loop, daemon=True)
+    acq.start()
+    worker.start()
+    try:
+        while worker.is_alive() and plt.fignum_exists(fig.number):
+            try:
+                data, extent = snap_q.get(timeout=0.1)
+            except queue.Empty:
+                fig.canvas.flush_events()
+                continue
+            update_plot(data, extent)
+    finally:
+        stop.set()
+        worker.join(timeout=2.0)
+        acq.join(timeout=2.0)
 
 if __name__ == "__main__":
     main()
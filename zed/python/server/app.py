@@ -1,23 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import argparse
+import asyncio
+import csv
 import json
 import importlib.util
-from dataclasses import asdict
 import os
+import stat
 from pathlib import Path
 import sys
 import time
-import pandas as pd
 from typing import Optional, List
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi.websockets import WebSocketState
 from fastapi.responses import FileResponse
+from fastapi.datastructures import Headers
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+import numpy as np
 import uvicorn
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict #  [추가] Dict 임포트
-from copy import deepcopy
+from dataclasses import fields, replace
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from fastapi.responses import FileResponse
@@ -33,20 +38,19 @@ if ROOT.name == "server":
 else:
     LOG_BASE_DIR = (ROOT / "logs").resolve()
 STATIC = ROOT / "static"
-PIPELINE_PATH = ROOT / "pipeline.py"
 COEFFS_JSON = ROOT / "coeffs.json"
 
 # -----------------------------
-# Import pipeline.py dynamically
+# Import pipeline.py (같은 디렉터리의 일반 모듈 → import 캐시/__pycache__ 바이트코드 재사용)
 # -----------------------------
-spec = importlib.util.spec_from_file_location("adc_pipeline", str(PIPELINE_PATH))
-adc_pipeline = importlib.util.module_from_spec(spec)
-sys.modules["adc_pipeline"] = adc_pipeline
-assert spec.loader is not None
-spec.loader.exec_module(adc_pipeline)
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))  # 스크립트 실행이 아닌 `uvicorn server.app:app` 형태로 import될 때
+import pipeline as adc_pipeline
 
 Pipeline = adc_pipeline.Pipeline
 PipelineParams = adc_pipeline.PipelineParams
+# set_params의 변경분 비교용 필드 이름 집합 (요청마다 hasattr 조회 대신 집합 멤버십)
+PARAM_FIELDS = frozenset(f.name for f in fields(PipelineParams))
 DEFAULT_DEVICE_URI = getattr(adc_pipeline, "DEFAULT_DEVICE_URI", os.getenv("BOARD_IP", "ip:localhost"))
 
 # -----------------------------
@@ -75,26 +79,64 @@ class CoeffsUpdate(BaseModel):
     
     
 class ParamsIn(BaseModel):
-    sampling_frequency: Optional[float] = None
-    block_samples: Optional[int] = None
-    target_rate_hz: Optional[float] = None
-    lpf_cutoff_hz: Optional[float] = None
-    movavg_ch_sec: Optional[float] = None
-    movavg_r_sec: Optional[float] = None
+    # UI가 보내는 여분 키는 검증 없이 버림
+    model_config = ConfigDict(extra="ignore")
+
+    # 범위 검사는 모델에서 한 번에 (위반 시 422): 0/음수 값이 C 인자로 넘어가 리더가 종료되는 것을 막음
+    sampling_frequency: Optional[float] = Field(None, gt=0)
+    block_samples: Optional[int] = Field(None, gt=0)
+    target_rate_hz: Optional[float] = Field(None, gt=0)
+    lpf_cutoff_hz: Optional[float] = Field(None, gt=0)
+    movavg_ch_sec: Optional[float] = Field(None, ge=0)
+    movavg_r_sec: Optional[float] = Field(None, ge=0)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles + 재검증 캐시 + 미리 압축된 `<파일>.gz` 전송.
+    - 파일명에 해시가 없으므로 `no-cache`: 브라우저는 캐시를 쓰되 매번 ETag로 확인 (대부분 304)
+    - deploy.sh가 만든 .gz가 있고 원본보다 새것이며 브라우저가 gzip을 받으면 그것을 그대로 전송 (보드에서 압축 CPU 없음)
+    """
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        gz_stat = None
+        if "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            try:
+                gz_stat = os.stat(str(full_path) + ".gz")
+            except OSError:
+                pass
+        # 원본보다 오래된 .gz(원본만 수정하고 deploy.sh를 안 돌린 경우)는 무시하고 원본 전송
+        if gz_stat is not None and stat.S_ISREG(gz_stat.st_mode) and gz_stat.st_mtime >= stat_result.st_mtime:
+            # Content-Type은 mimetypes가 `x.js.gz` → text/javascript로 추정, ETag/304도 .gz 기준
+            response = super().file_response(str(full_path) + ".gz", gz_stat, scope, status_code)
+            if response.status_code != 304:
+                response.headers["content-encoding"] = "gzip"
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = "no-cache"
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
 
 # -----------------------------
 # FastAPI app & Helpers
 # -----------------------------
-app = FastAPI(title="AD4858 Realtime Web UI")
+# /docs, /redoc, /openapi.json은 개발 시에만 노출 (ENABLE_DOCS=1). 운영 UI는 쓰지 않음
+_DOCS = {} if os.getenv("ENABLE_DOCS") == "1" else {"docs_url": None, "redoc_url": None, "openapi_url": None}
+app = FastAPI(title="AD4858 Realtime Web UI", **_DOCS)
+
+# 재시작 디바운스 상태: 슬라이더 드래그 등으로 POST가 몰려도 C 프로세스는 마지막 값으로 한 번만 재시작
+RESTART_DEBOUNCE_S = 0.25
+# C 코드(iio_reader 인자)에 영향을 주는 파라미터: 하나라도 바뀌면 재시작
+CRITICAL_KEYS = frozenset({"sampling_frequency", "block_samples", "target_rate_hz",
+                           "lpf_cutoff_hz", "movavg_r", "movavg_ch"})
+# WS 한 메시지에 묶을 최대 프레임 수 (실제로는 FrameQueue 크기가 상한)
+WS_BATCH_MAX = 16
+# send 실패 시 수신 태스크가 disconnect를 받을 때까지 기다리는 최대 시간 (닫히는 중인지 판별)
+WS_CLOSE_GRACE_S = 1.0
+app.state.pending_params = None   # 예약(또는 적용 중)된 최신 PipelineParams
+app.state.restart_task = None     # 디바운스 대기 중인 재시작 태스크
+app.state.restart_lock = None     # stop/start 직렬화용 asyncio.Lock (이벤트 루프 안에서 생성)
 if STATIC.exists():
-    app.mount("/static", StaticFiles(directory=str(STATIC)), name="static")
-
-def _with_legacy_keys(p: dict) -> dict:
-    if "y1_den" in p: p["coeffs_y1"] = p["y1_den"]
-    if "y2_coeffs" in p: p["coeffs_y2"] = p["y2_coeffs"]
-    if "y3_coeffs" in p: p["coeffs_y3"] = p["y3_coeffs"]
-    if "E" in p and "F" in p: p["coeffs_yt"] = [p["E"], p["F"]]
-    return p
+    app.mount("/static", CachedStaticFiles(directory=str(STATIC)), name="static")
 
 # -----------------------------
 # Routes
@@ -112,71 +154,64 @@ async def download_file():
 
 
 
-@app.get("/")
-async def index():
-    return FileResponse(STATIC / "index.html")
+def _resample_1s(labels: List[float], data: List[float], start_ts: float):
+    """상대시간 label + 값 → (첫 구간의 Unix 초, 1초 구간 평균 배열, 빈 구간은 NaN).
+    datetime처럼 µs로 반올림한 뒤 초 단위로 내림 → 기존 resample('1S').mean()과 같은 구간."""
+    us = np.rint((start_ts + np.asarray(labels, dtype=np.float64)) * 1e6).astype(np.int64)
+    sec = us // 1_000_000
+    first = int(sec.min())
+    idx = sec - first
+    n = int(idx.max()) + 1
+    counts = np.bincount(idx, minlength=n)
+    sums = np.bincount(idx, weights=np.asarray(data, dtype=np.float64), minlength=n)
+    with np.errstate(invalid="ignore"):
+        return first, sums / counts
 
 
 #  [추가] 데이터 처리 및 CSV 저장을 위한 헬퍼 함수
 def process_and_save_csv(all_data: AllChartData, file_path: Path, start_ts: float):
     """
-    모든 차트 데이터를 병합하여 단일 CSV 파일로 저장합니다. (리샘플링 없음)
+    모든 차트 데이터를 1초 구간 평균으로 맞춰 단일 CSV 파일로 저장합니다.
+    (pandas 없이 numpy bincount + csv.writer: 데이터셋별 DataFrame/resample/concat 할당 없음)
     """
-    all_series = []
-    
-    #  [수정] start_ts 인자를 받도록 시그니처 변경
-    def create_series_from_chart_data(chart_data: ChartData, base_name: str, start_ts: float) -> list:
-        series_list = []
+    columns = []  # (컬럼명, 첫 구간의 Unix 초, 1초 평균 배열)
+
+    def add_chart(chart_data: ChartData, base_name: str):
         if not chart_data.labels or not chart_data.datasets:
-            return []
-            
-        #  [1. 시간대 설정] 한국 시간(KST, UTC+9)을 정의합니다.
-        kst = ZoneInfo("Asia/Seoul")
-        
+            return
         num_datasets = len(chart_data.datasets)
-
         for i, ds in enumerate(chart_data.datasets):
             if not ds.data: continue
-            
-            # 상대 시간(label)을 절대 시간(Unix timestamp)으로 변환
-            absolute_timestamps = [start_ts + label for label in chart_data.labels]
-            #  [1. 시간대 설정] Unix timestamp를 KST 기준 datetime 객체로 변환
-            datetime_index = [datetime.fromtimestamp(ts, tz=kst) for ts in absolute_timestamps]
-            
-            df = pd.DataFrame(index=datetime_index, data={'value': ds.data})
-            
-            #  [2. 1초 단위 로그 수집] 데이터를 1초 간격으로 리샘플링하고 평균값을 사용
-            df = df.resample('1S').mean()
-            
-            if num_datasets > 1:
-                col_name = f"{base_name}_{ds.label or i}"
-            else:
-                col_name = base_name
-
-            df.rename(columns={'value': col_name}, inplace=True)
-            series_list.append(df)
-        return series_list
-
-    #  [수정] create_series_from_chart_data 호출 시 start_ts 전달
-    all_series.extend(create_series_from_chart_data(all_data.stage3, 'S3', start_ts))
-    all_series.extend(create_series_from_chart_data(all_data.stage5, 'S5', start_ts))
+            first, means = _resample_1s(chart_data.labels, ds.data, start_ts)
+            col_name = f"{base_name}_{ds.label or i}" if num_datasets > 1 else base_name
+            columns.append((col_name, first, means))
+
+    add_chart(all_data.stage3, 'S3')
+    add_chart(all_data.stage5, 'S5')
     for ch, stages in all_data.stages789.items():
         for stage, data in stages.items():
-            prefix = f"{ch}_{stage}"
-            all_series.extend(create_series_from_chart_data(data, prefix, start_ts))
-            
-    if not all_series:
+            add_chart(data, f"{ch}_{stage}")
+
+    if not columns:
         return
 
-    final_df = pd.concat(all_series, axis=1)
-    final_df.sort_index(inplace=True)
-    
-    #  [추가] CSV로 저장하기 전, 인덱스(시간)의 형식을 원하는 문자열로 변경합니다.
-    # '%Y-%m-%d %H:%M:%S.%f'는 마이크로초(6자리)까지 표시, .str[:-3]으로 밀리초(3자리)에서 자름
-    final_df.index = final_df.index.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3]
-    
-    #  [수정] CSV 저장 시 인덱스 컬럼명을 'Timestamp'로 변경
-    final_df.to_csv(file_path, float_format='%.6f', index_label='Timestamp')
+    # 행 = 모든 컬럼 구간의 합집합(시간순), 값이 없는 칸은 NaN → 빈 칸
+    t0 = min(first for _, first, _ in columns)
+    n_rows = max(first + len(means) for _, first, means in columns) - t0
+    table = np.full((n_rows, len(columns)), np.nan)
+    covered = np.zeros(n_rows, dtype=bool)
+    for j, (_, first, means) in enumerate(columns):
+        table[first - t0:first - t0 + len(means), j] = means
+        covered[first - t0:first - t0 + len(means)] = True
+
+    #  [1. 시간대 설정] 한국 시간(KST, UTC+9), 밀리초(3자리)까지 표시
+    kst = ZoneInfo("Asia/Seoul")
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["Timestamp"] + [name for name, _, _ in columns])
+        for r in np.flatnonzero(covered).tolist():
+            stamp = datetime.fromtimestamp(t0 + r, tz=kst).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            writer.writerow([stamp] + ["" if v != v else "%.6f" % v for v in table[r].tolist()])
 
 
 
@@ -205,7 +240,8 @@ async def save_data(data: AllChartData):
             start_timestamp = time.time()
             
         #  [수정] 데이터 처리 함수 호출 시 start_timestamp 전달
-        process_and_save_csv(data, file_path, start_timestamp)
+        # 1초 평균 + CSV 쓰기는 데이터가 많으면 수십 ms 이상 → 워커 스레드에서 실행 (WS 프레임 전송이 멈추지 않도록)
+        await run_in_threadpool(process_and_save_csv, data, file_path, start_timestamp)
         
         return {"ok": True, "message": f"Data saved to {file_path.resolve()}"}
     except Exception as e:
@@ -220,21 +256,79 @@ async def save_data(data: AllChartData):
 async def set_coeffs(p: CoeffsUpdate):
     """실행 중인 C 프로세스에 계수만 실시간으로 업데이트합니다."""
     app.state.pipeline.update_coeffs(p.key, p.values)
+    _publish_params(app.state.pipeline)
 
     # UI의 'Configuration' 탭 정보도 동기화
-    updated_params = _with_legacy_keys(asdict(app.state.pipeline.params))
-    return {
+    updated_params = app.state.pipeline.params_dict()
+    return _json_response({
         "ok": True,
         "message": f"Coefficients for '{p.key}' updated.",
         "params": updated_params
-    }
+    })
 
 
 
 @app.get("/api/params")
 async def get_params():
-    #  .model_dump() -> asdict() 수정 (1/4)
-    return _with_legacy_keys(asdict(app.state.pipeline.params))
+    # 캐시된 직렬화본을 그대로 반환 (params는 POST/계수 변경 시에만 바뀜)
+    return Response(content=app.state.pipeline.params_json(), media_type="application/json")
+
+
+def _json_response(payload):
+    """dict → 미리 직렬화한 JSON Response (FastAPI의 jsonable_encoder 순회를 건너뜀)."""
+    return Response(content=adc_pipeline._dumps(payload), media_type="application/json")
+
+
+def _publish_params(pipeline):
+    """params가 바뀐 뒤 열린 모든 대시보드에 동기화 (캐시된 WS params 메시지 그대로 전송)."""
+    pipeline._publish(pipeline.params_frame(), is_params=True)
+
+
+async def _restart_pipeline(new_params):
+    """현재 파이프라인을 new_params로 교체. 기존 WS 컨슈머는 새 파이프라인으로 이전."""
+    if app.state.restart_lock is None:
+        app.state.restart_lock = asyncio.Lock()
+    async with app.state.restart_lock:
+        p_current = app.state.pipeline
+        # IIO 버퍼는 디바이스당 하나만 열 수 있으므로 cproc는 먼저 종료해야 함.
+        # synthetic은 하드웨어를 쓰지 않으니 새 인스턴스를 먼저 띄워 프레임 공백을 없앰 (더블 버퍼)
+        overlap = p_current.params.mode != "cproc" and new_params.mode != "cproc"
+        if not overlap:
+            await run_in_threadpool(p_current.stop)  # C 프로세스 종료 + 스레드 join(최대 3초)을 이벤트 루프 밖에서
+        # cproc는 생성자에서 iio_reader를 Popen(fork/exec)하므로 생성도 스레드풀에서
+        new_pipeline = await run_in_threadpool(Pipeline, params=new_params, broadcast_fn=p_current.broadcast_fn)
+        new_pipeline.start()  # 데몬 스레드 기동만 하므로 루프에서 바로 호출
+        # 컨슈머 이전과 교체 사이에 await가 없어야 WS 등록이 이전 인스턴스에 남지 않음
+        new_pipeline.adopt_consumers(p_current)
+        app.state.pipeline = new_pipeline
+        if overlap:
+            await run_in_threadpool(p_current.stop)
+    return new_pipeline
+
+
+async def _delayed_restart():
+    # 대기 중에만 취소 가능: 새 POST가 오면 타이머가 다시 시작됨
+    await asyncio.sleep(RESTART_DEBOUNCE_S)
+    app.state.restart_task = None
+    params = app.state.pending_params
+    try:
+        _publish_params(await _restart_pipeline(params))
+    except Exception as e:
+        # 이 태스크는 아무도 await하지 않음 → 여기서 기록하지 않으면 예외가 사라짐
+        print(f"[ERROR] Pipeline restart failed: {e!r}")
+        return
+    finally:
+        # 실패해도 예약 상태는 해제 (남아 있으면 이후 요청이 적용되지 않은 값을 기준으로 비교됨)
+        if app.state.pending_params is params:
+            app.state.pending_params = None
+    print("[INFO] Pipeline has been restarted due to critical parameter change.")
+
+
+def _cancel_pending_restart():
+    task = app.state.restart_task
+    if task is not None and not task.done():
+        task.cancel()
+    app.state.restart_task = None
 
 
 @app.post("/api/params")
@@ -242,15 +336,15 @@ async def set_params(p: ParamsIn):
     """
     파라미터 업데이트 엔드포인트 (최종 버전)
     - UI의 모든 파라미터를 처리하고 단위를 변환합니다.
-    - C 코드에 영향을 주는 파라미터 변경 시 파이프라인을 재시작하고
-      'restarted' 신호를 보내 페이지 새로고침을 유도합니다.
+    - LPF 차단주파수는 실행 중인 C 프로세스에 바로 반영, 그 외 C 인자 변경 시 재시작을 예약하고
+      (RESTART_DEBOUNCE_S 동안 추가 요청이 없으면 실행) 'restarted' 신호를 보냅니다.
     """
     # 1. UI로부터 받은 데이터 중 실제 값이 있는 것만 사전 형태로 추출
-    body = p.model_dump(exclude_unset=True)
+    #    (빈 입력칸은 JS에서 NaN → null로 오므로 None도 함께 제외)
+    body = p.model_dump(exclude_unset=True, exclude_none=True)
     
-    # 2. 현재 파이프라인의 파라미터를 사전 형태로 복사
-    current_params = app.state.pipeline.params
-    new_params_dict = asdict(current_params)
+    # 2. 기준 파라미터: 예약된 재시작이 있으면 그 값 (연속 요청의 변경분이 누적되도록)
+    current_params = app.state.pending_params or app.state.pipeline.params
     
     # 3. '초(sec)' 단위를 C가 사용할 '샘플 수'로 변환
     #    - 변환에 필요한 최신 주파수 값을 사용 (body에 있으면 body 값, 없으면 현재 값)
@@ -267,48 +361,46 @@ async def set_params(p: ParamsIn):
         # R MA는 시간 평균 후 신호에 적용되므로 'target_rate_hz'(tr)로 계산
         body["movavg_r"] = max(1, round(sec * tr))
 
-    # 4. 변경된 값이 있는지 확인하고, 있다면 새로운 파라미터 사전에 업데이트
-    changed = {}
-    for key, value in body.items():
-        if hasattr(current_params, key) and value != getattr(current_params, key):
-            new_params_dict[key] = value
-            changed[key] = value
+    # 4. 변경된 값만 추려냄
+    changed = {k: v for k, v in body.items() if k in PARAM_FIELDS and v != getattr(current_params, k)}
     
-    # 5. C 코드에 영향을 주는 파라미터 중 하나라도 바뀌면 재시작
+    # 5. C 코드에 영향을 주는 파라미터 중 하나라도 바뀌면 재시작 예약 (디바운스)
     restarted = False
-    critical_keys = ["sampling_frequency", "block_samples", "target_rate_hz", "lpf_cutoff_hz", "movavg_r", "movavg_ch"]
-    if any(k in changed for k in critical_keys):
-        p_current = app.state.pipeline
-        p_current.stop()
-        
-        # 업데이트된 파라미터 사전으로 새 PipelineParams 객체 생성
-        new_params_obj = PipelineParams(**new_params_dict)
-        
-        # 새 파이프라인 생성 및 시작
-        new_pipeline = Pipeline(params=new_params_obj, broadcast_fn=p_current.broadcast_fn)
-        new_pipeline.start()
-        app.state.pipeline = new_pipeline # 앱의 상태를 새 파이프라인으로 교체
+    params_out = app.state.pipeline.params_dict()
+    if app.state.pending_params is None and app.state.pipeline.apply_params(changed):
+        # LPF 차단주파수처럼 실행 중인 C 프로세스가 받을 수 있는 값은 재시작 없이 바로 반영
+        _publish_params(app.state.pipeline)
+        params_out = app.state.pipeline.params_dict()
+    elif not CRITICAL_KEYS.isdisjoint(changed):
+        # 기준 파라미터에 변경분만 덮어쓴 새 PipelineParams 객체를 예약
+        new_params_obj = replace(current_params, **changed)
+        app.state.pending_params = new_params_obj
+        _cancel_pending_restart()
+        app.state.restart_task = asyncio.create_task(_delayed_restart())
         restarted = True
-        print("[INFO] Pipeline has been restarted due to critical parameter change.")
+        params_out = new_params_obj.to_dict()
     
     # 6. 최종 결과 반환
-    return {
+    return _json_response({
         "ok": True, 
         "changed": changed, 
         "restarted": restarted,
-        "params": _with_legacy_keys(asdict(app.state.pipeline.params))
-    }
+        "restart": "scheduled" if restarted else None,
+        "params": params_out
+    })
 
 
 
 
 @app.post("/api/params/reset")
 async def reset_params():
+    # 예약된 재시작은 취소 (초기화 값이 우선)
+    _cancel_pending_restart()
+    app.state.pending_params = None
     p_current = app.state.pipeline
-    p_current.stop()
 
     # 기본 파라미터 불러오기
-    base = deepcopy(app.state.default_params)
+    base = app.state.default_params.copy()
     # 실행 관련 값은 현재 pipeline 것 유지
     base.mode = p_current.params.mode
     base.exe_path = p_current.params.exe_path
@@ -316,14 +408,11 @@ async def reset_params():
     # base.block_samples = p_current.params.block_samples
     # base.sampling_frequency = p_current.params.sampling_frequency
 
-    new_pipeline = Pipeline(params=base, broadcast_fn=p_current.broadcast_fn)
-    new_pipeline.start()
-    app.state.pipeline = new_pipeline
+    new_pipeline = await _restart_pipeline(base)
 
-    payload = {"type": "params", "data": _with_legacy_keys(asdict(new_pipeline.params))}
-    app.state.pipeline._broadcast(payload)  # 초기화된 값 즉시 push
+    _publish_params(new_pipeline)  # 초기화된 값 즉시 push
 
-    return {"ok": True, "restarted": True, "params": _with_legacy_keys(asdict(new_pipeline.params))}
+    return _json_response({"ok": True, "restarted": True, "params": new_pipeline.params_dict()})
 
 
 
@@ -335,19 +424,95 @@ async def favicon():
 # -----------------------------
 # WebSocket
 # -----------------------------
+async def _ws_send(ws: WebSocket, msg):
+    # 인코딩된 bytes(orjson JSON 또는 MessagePack)는 바이너리 프레임 그대로 전송 (브라우저가 첫 바이트로 구분)
+    if isinstance(msg, bytes):
+        await ws.send_bytes(msg)
+    else:
+        await ws.send_text(msg)
+
+
+async def _ws_sender(ws: WebSocket, q):
+    """큐 → 소켓. 소켓 send가 막혀도 파이프라인 쪽은 FrameQueue가 오래된 프레임을 버리며 진행."""
+    while True:
+        msg = await q.get()
+        # params가 보관돼 있으면 프레임보다 먼저 전송 (None은 params만 있을 때의 깨우기 토큰)
+        params_msg = q.take_params()
+        if params_msg is not None:
+            await _ws_send(ws, params_msg)
+        if msg is None:
+            continue
+        # 밀린 프레임이 있으면 배열 메시지 하나로 묶어 한 번에 전송 (WS 프레임/write 횟수 절감)
+        if not q.empty():
+            batch = [msg]
+            while len(batch) < WS_BATCH_MAX and not q.empty():
+                m = q.get_nowait()
+                if m is not None:  # 위 params 전송 중에 들어온 깨우기 토큰은 프레임이 아님
+                    batch.append(m)
+            if len(batch) > 1:
+                msg = adc_pipeline._join_batch(batch)
+        # 위 params 전송 중 새 params가 왔으면 (그 토큰은 방금 건너뛰었을 수 있음) 프레임보다 먼저 전송
+        params_msg = q.take_params()
+        if params_msg is not None:
+            await _ws_send(ws, params_msg)
+        await _ws_send(ws, msg)
+
+
+async def _ws_receiver(ws: WebSocket):
+    """클라이언트 → 서버 메시지는 쓰지 않지만, 읽어야 종료(close)를 프레임 없이도 바로 감지."""
+    while True:
+        msg = await ws.receive()
+        if msg["type"] == "websocket.disconnect":
+            return
+
+
+def _ws_closed(ws: WebSocket, receiver: asyncio.Task) -> bool:
+    """연결이 이미 닫혔는지: 수신 태스크가 disconnect를 받고 정상 종료했거나 소켓 상태가 DISCONNECTED."""
+    if receiver.done() and not receiver.cancelled() and receiver.exception() is None:
+        return True
+    return WebSocketState.DISCONNECTED in (ws.client_state, ws.application_state)
+
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
+    # permessage-deflate는 uvicorn.run에서 끔: float 배열 JSON은 압축 이득에 비해
+    # 프레임마다 zlib 비용이 커서 이벤트 루프를 막음 (LAN 대역폭이 더 싸다)
     await ws.accept()
-    q = app.state.pipeline.register_consumer()
-    await ws.send_json({"type": "params", "data": _with_legacy_keys(asdict(app.state.pipeline.params))})
+    pipeline = app.state.pipeline
+    q = pipeline.register_consumer()
+    tasks = set()
     try:
-        while True:
-            msg = await q.get()
-            await ws.send_text(msg)
+        await _ws_send(ws, pipeline.params_message())
+        # 송신/수신을 별도 태스크로: 어느 쪽이든 끝나면(연결 종료·전송 실패) 나머지를 정리
+        sender = asyncio.create_task(_ws_sender(ws, q))
+        receiver = asyncio.create_task(_ws_receiver(ws))
+        tasks = {sender, receiver}
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if sender in done and not receiver.done():
+            # 클라이언트가 닫는 중이면 send가 먼저 실패할 수 있음 → 수신 쪽이 disconnect를 받을 시간을 줌
+            await asyncio.wait({receiver}, timeout=WS_CLOSE_GRACE_S)
+        for t in done:
+            exc = t.exception()
+            # 닫힌 뒤의 send 실패(RuntimeError, ConnectionClosed 등)는 정상 종료로 처리
+            if exc is not None and not isinstance(exc, WebSocketDisconnect) and not _ws_closed(ws, receiver):
+                raise exc
     except WebSocketDisconnect:
         pass
     finally:
-        pass
+        for t in tasks:
+            t.cancel()
+        # 재시작으로 큐가 새 파이프라인에 이전됐을 수 있으므로 현재 파이프라인에서 해제
+        app.state.pipeline.unregister_consumer(q)
+        if q.dropped:
+            print(f"[WS] client closed; {q.dropped} stale frame(s) dropped for this client")
+
+# -----------------------------
+# Index page
+# -----------------------------
+# "/" → static/index.html. StaticFiles가 ETag/Last-Modified를 붙이고 If-None-Match에 304로 응답
+# (반드시 마지막에 mount: 앞에 두면 /api/*, /ws 라우트를 가림)
+if STATIC.exists():
+    app.mount("/", CachedStaticFiles(directory=str(STATIC), html=True), name="root")
 
 # -----------------------------
 # Entrypoint (최종 수정 버전)
@@ -391,7 +556,7 @@ if __name__ == "__main__":
     # --- 3. 파이프라인 생성 및 시작 ---
     #  [수정] pipeline에 startup_params의 '복사본'을 전달하여
     # default_params가 오염되지 않도록 합니다.
-    pipeline = Pipeline(params=deepcopy(startup_params), broadcast_fn=lambda payload: None)
+    pipeline = Pipeline(params=startup_params.copy(), broadcast_fn=lambda payload: None)
     pipeline.start()
 
     # --- 4. FastAPI 앱 상태(app.state)에 객체 저장 ---
@@ -401,5 +566,18 @@ if __name__ == "__main__":
     app.state.pipeline = pipeline
 
     # --- 5. 서버 실행 ---
-    print(f"[INFO] pipeline loaded with params: {_with_legacy_keys(asdict(pipeline.params))}")
-    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
\ No newline at end of file
+    print(f"[INFO] pipeline loaded with params: {pipeline.params_dict()}")
+    # uvloop/httptools가 설치되어 있으면 명시적으로 사용 (없으면 기본 asyncio/h11로 동작)
+    # pipeline은 프로세스당 하나뿐이므로 워커는 1개로 고정 (SO_REUSEPORT로 여러 프로세스가
+    # 포트를 나누면 IIO 리더가 경쟁하므로 쓰지 않음). TCP_NODELAY는 asyncio/uvloop가 TCP
+    # 소켓마다 기본으로 켜므로 작은 WS 프레임도 Nagle 지연 없이 나감
+    # WS ping은 20초 간격/타임아웃: 끊긴 브라우저(절전 등)를 감지해 컨슈머 큐를 정리
+    # 요청마다 찍히는 access 로그는 끔 (기동 메시지/경고/에러는 log_level="info"로 그대로 출력)
+    loop_impl = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http_impl = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    # /ws는 websockets 구현으로 고정 (없으면 uvicorn이 wsproto 등 설치된 것을 자동 선택)
+    ws_impl = "websockets" if importlib.util.find_spec("websockets") else "auto"
+    print(f"[INFO] event loop: {loop_impl}, http: {http_impl}, ws: {ws_impl}")
+    uvicorn.run(app, host=args.host, port=args.port, loop=loop_impl, http=http_impl, ws=ws_impl,
+                ws_per_message_deflate=False, ws_ping_interval=20.0, ws_ping_timeout=20.0,
+                workers=1, log_level="info", access_log=False)
\ No newline at end of file
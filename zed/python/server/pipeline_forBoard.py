@@ -13,11 +13,23 @@ import threading
 import time
 import math
 import os
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field, fields, replace
 
 import numpy as np
 import sys
 
+# orjson은 선택 의존성: 있으면 NumPy 배열을 그대로 직렬화 (NaN/Inf → null), 없으면 json 경로
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ormsgpack도 선택 의존성: 있으면 WS 프레임을 MessagePack(바이너리 float)으로 보냄, 없으면 JSON
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
 
 # -----------------------------
 # [0] NaN/Inf 정규화 + strict JSON
@@ -40,6 +52,54 @@ def _json_safe(v):
     return v
 
 
+def _finite_tolist(arr):
+    """프레임 배열 → 중첩 리스트. 전부 유한하면 tolist 한 번으로 끝내고,
+    NaN/Inf가 있을 때만 _json_safe 경로로 None 치환 (원소별 재귀 없음)."""
+    if np.isfinite(arr).all():
+        return arr.tolist()
+    return _json_safe(arr)
+
+
+def _frame_array(arr):
+    """payload에 넣을 프레임 배열. orjson/ormsgpack이면 C-연속 배열 그대로(직렬화 시 한 번에 변환),
+    아니면 JSON-safe 중첩 리스트."""
+    if orjson is not None or ormsgpack is not None:
+        return np.ascontiguousarray(arr)
+    return _finite_tolist(arr)
+
+
+def _dumps(payload):
+    """payload → 전송용 JSON 메시지 (프레임은 _frame_array/_json_safe로 이미 정규화됨).
+    orjson이면 UTF-8 bytes 그대로(바이너리 WS 프레임, 재인코딩 없음), 아니면 str."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":"), allow_nan=False)
+
+
+def _pack(payload):
+    """WS 프레임 채널용 인코딩. ormsgpack이면 MessagePack bytes (float32는 4바이트 그대로,
+    10진 텍스트 변환 없음), 아니면 _dumps와 같은 JSON."""
+    if ormsgpack is not None:
+        return ormsgpack.packb(payload, option=ormsgpack.OPT_SERIALIZE_NUMPY)
+    return _dumps(payload)
+
+
+def _join_batch(msgs):
+    """_pack으로 인코딩된 메시지 여러 개 → 배열 메시지 하나 (다시 디코드하지 않고 이어 붙임)."""
+    if ormsgpack is not None:
+        # MessagePack array16 헤더(0xdc + 원소 수) 뒤에 원소를 그대로 연결
+        return b"\xdc" + struct.pack(">H", len(msgs)) + b"".join(msgs)
+    if isinstance(msgs[0], bytes):
+        return b"[" + b",".join(msgs) + b"]"
+    return "[" + ",".join(msgs) + "]"
+
+
+# 시리즈 이름은 채널 수(최대 4)만큼 고정 → 프레임마다 문자열/리스트를 새로 만들지 않음
+_RAVG_NAMES = ["Ravg{}".format(k) for k in range(4)]
+_Y2_NAMES = ["y2_{}".format(k) for k in range(4)]
+_Y3_NAMES = ["y3_{}".format(k) for k in range(4)]
+
+
 # -----------------------------
 # [1] 공통 소스 베이스
 # -----------------------------
@@ -95,23 +155,27 @@ class CProcSource(SourceBase):
         self._stdout = self.proc.stdout
         self._stdin = self.proc.stdin
         self._hdr_struct = struct.Struct("<BII")
-
-    def _read_exact(self, n):
-        buf = bytearray()
-        while len(buf) < n:
-            chunk = self._stdout.read(n - len(buf))
-            if not chunk:
+        self._hdr_buf = bytearray(self._hdr_struct.size)
+
+    def _read_into(self, buf):
+        """stdout에서 buf 크기만큼 정확히 읽어 buf를 채움 (readinto, 중간 복사 없음)"""
+        view = memoryview(buf)
+        got, n = 0, len(view)
+        while got < n:
+            k = self._stdout.readinto(view[got:])
+            if not k:
                 stderr_output = self.proc.stderr.read().decode(errors='ignore')
                 raise EOFError("CProcSource: unexpected EOF. Stderr: {}".format(stderr_output))
-            buf.extend(chunk)
-        return bytes(buf)
+            got += k
 
     def read_frame(self):
-        hdr_bytes = self._read_exact(self._hdr_struct.size)
-        ftype, n_samp, n_ch = self._hdr_struct.unpack(hdr_bytes)
+        self._read_into(self._hdr_buf)
+        ftype, n_samp, n_ch = self._hdr_struct.unpack_from(self._hdr_buf)
 
-        payload_bytes = self._read_exact(n_samp * n_ch * 4)
-        arr = np.frombuffer(payload_bytes, dtype=np.float32).reshape(n_samp, n_ch)
+        # 페이로드는 프레임마다 새 버퍼 (반환 배열이 다음 프레임과 공유되지 않도록)
+        payload = bytearray(n_samp * n_ch * 4)
+        self._read_into(payload)
+        arr = np.frombuffer(payload, dtype=np.float32).reshape(n_samp, n_ch)
 
         return int(ftype), arr
 
@@ -144,26 +208,25 @@ class SyntheticSource(SourceBase):
     def __init__(self, rate_hz=10.0):
         self.rate = float(rate_hz)
         self._k = 0
+        # 시간축이 매번 같으므로 세 프레임을 한 번만 계산 (채널 축 브로드캐스트, 채널별 루프/stack 없음)
+        t = (np.arange(5) / self.rate)[:, None]
+        self._frames = [
+            (self.FT_STAGE3, self._frozen(np.sin(2*np.pi*(0.2 + 0.02*np.arange(8))*t))),        # 8ch stage3
+            (self.FT_STAGE5, self._frozen(np.cos(2*np.pi*(0.1 + 0.01*np.arange(4))*t))),        # 4ch ravg
+            (self.FT_YT,     self._frozen(np.sin(2*np.pi*(0.05 + 0.01*np.arange(4))*t + 0.5))), # 4ch yt
+        ]
+
+    @staticmethod
+    def _frozen(arr):
+        # 같은 배열을 매 프레임 내보내므로 읽기 전용으로 (소비자가 실수로 바꾸지 못하게)
+        arr = arr.astype(np.float32)
+        arr.flags.writeable = False
+        return arr
 
     def read_frame(self):
         # 순서: 1 -> 2 -> 3 반복
         self._k = (self._k % 3) + 1
-        t = np.arange(5) / self.rate
-        if self._k == 1:
-            # 8ch stage3
-            data = [np.sin(2*np.pi*(0.2 + 0.02*c)*t).astype(np.float32) for c in range(8)]
-            arr = np.stack(data, axis=1)
-            return self.FT_STAGE3, arr
-        elif self._k == 2:
-            # 4ch ravg
-            data = [np.cos(2*np.pi*(0.1 + 0.01*c)*t).astype(np.float32) for c in range(4)]
-            arr = np.stack(data, axis=1)
-            return self.FT_STAGE5, arr
-        else:
-            # 4ch yt
-            data = [np.sin(2*np.pi*(0.05 + 0.01*c)*t + 0.5).astype(np.float32) for c in range(4)]
-            arr = np.stack(data, axis=1)
-            return self.FT_YT, arr
+        return self._frames[self._k - 1]
 
 
 # -----------------------------
@@ -206,12 +269,58 @@ class PipelineParams:
     E = 1.0
     F = 0.0
 
+    def to_dict(self):
+        """응답/WS용 dict: asdict + 구버전 UI 키(coeffs_y1/y2/y3/yt)를 한 번에 구성."""
+        d = asdict(self)
+        d["coeffs_y1"] = d["y1_den"]
+        d["coeffs_y2"] = d["y2_coeffs"]
+        d["coeffs_y3"] = d["y3_coeffs"]
+        d["coeffs_yt"] = [d["E"], d["F"]]
+        return d
+
+    def copy(self):
+        """독립 사본. 가변 필드는 리스트뿐이므로 리스트만 새로 만들어 replace (deepcopy의 재귀 순회 없음)."""
+        lists = {f.name: list(getattr(self, f.name)) for f in fields(self) if isinstance(getattr(self, f.name), list)}
+        return replace(self, **lists)
+
 
 #######################################################################
 
 # -----------------------------
 # [5] 파이프라인 클래스 (Python 3.7 호환)
 # -----------------------------
+# 재시작 없이 iio_reader stdin 커맨드로 바꿀 수 있는 파라미터 (SOS만 재설계, IIO 버퍼 유지)
+LIVE_PARAM_KEYS = frozenset({"lpf_cutoff_hz"})
+
+
+class FrameQueue(asyncio.Queue):
+    """WS 클라이언트별 프레임 큐 (maxsize 고정). 가득 차면 가장 오래된 프레임을 버리고
+    최신 것을 넣음 → 느린 클라이언트도 메모리는 고정, 파이프라인은 절대 대기하지 않음."""
+    def __init__(self, maxsize=2):
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0  # 버려진 프레임 수 (관측용)
+        # params 메시지는 프레임과 달리 버리면 안 됨 → 큐 밖 전용 슬롯(최신 1개)에 보관
+        self.params_msg = None
+
+    def offer(self, msg):
+        """이벤트 루프 스레드에서만 호출."""
+        if self.full():
+            if self.get_nowait() is not None:  # None은 params 깨우기 토큰
+                self.dropped += 1
+        self.put_nowait(msg)
+
+    def offer_params(self, msg):
+        """이벤트 루프 스레드에서만 호출. 이전 params는 새 것으로 대체 (항상 최신 값만 의미 있음)."""
+        self.params_msg = msg
+        if self.empty():
+            self.put_nowait(None)  # 대기 중인 get()을 깨우는 토큰 (뒤에 프레임이 쌓일 수 있음 → 소비 측이 건너뜀)
+
+    def take_params(self):
+        """보관된 params 메시지를 꺼내고 슬롯을 비움 (없으면 None)."""
+        msg, self.params_msg = self.params_msg, None
+        return msg
+
+
 class Pipeline:
     """
     데이터 소스(C 또는 Synthetic)를 관리하고, 읽어온 데이터를 처리하여
@@ -234,8 +343,8 @@ class Pipeline:
         else:
             raise ValueError("Unknown mode: {}".format(self.params.mode))
 
-        # WebSocket 컨슈머 목록
-        self._consumers = []
+        # WebSocket 컨슈머: 이벤트 루프 → 큐 목록 — 큐 조작은 루프 스레드에서만
+        self._consumers = {}
         self._consumers_lock = threading.Lock()
 
         # 내부 상태 캐싱 변수
@@ -247,9 +356,65 @@ class Pipeline:
         self._last_yt   = None
         self._pending_stage3_block = None
         self._pending_ts = None
+        # 파이프라인 수명 동안 고정인 프레임/통계 필드는 한 번만 구성 (재시작 시 새 인스턴스가 다시 만듦)
+        self._frame_params = {"target_rate_hz": _json_safe(self.params.target_rate_hz)}
+        self._stats_base = {
+            "sampling_frequency": float(self.params.sampling_frequency),
+            "block_samples": int(self.params.block_samples),
+        }
+        # 프레임 payload는 dict 하나를 재사용하고 바뀌는 값만 채움 (_dumps가 즉시 직렬화하므로 안전)
+        self._frame_payload = {
+            "type": "frame", "ts": None, "y_block": None, "n_ch": 0, "block": {"n": 0},
+            "params": self._frame_params,
+            "ravg_signals": None, "stage7_y2": None, "stage8_y3": None,
+            "derived": None, "stats": None,
+        }
+        self._params_dict = None  # params.to_dict() 캐시 (update_coeffs에서 무효화)
+        self._params_json = None  # 위 dict의 직렬화본 (GET /api/params 용)
+        self._params_msg = None  # WS params 메시지 캐시
+        self._params_frame = None  # 위 메시지의 프레임 채널 인코딩
 
     # 계수 업데이트
+    def params_dict(self):
+        """params.to_dict()를 한 번만 만들어 재사용 (읽기 전용으로 사용할 것)."""
+        if self._params_dict is None:
+            self._params_dict = self.params.to_dict()
+        return self._params_dict
+
+    def params_json(self):
+        """params_dict()의 JSON 직렬화본을 캐시 (params가 바뀔 때만 다시 인코딩)."""
+        if self._params_json is None:
+            self._params_json = _dumps(self.params_dict())
+        return self._params_json
+
+    def params_message(self):
+        """WS 'params' 메시지. 캐시된 params_json()을 감싸기만 하고 그 결과도 캐시."""
+        if self._params_msg is None:
+            data = self.params_json()
+            if isinstance(data, bytes):
+                self._params_msg = b'{"type":"params","data":' + data + b"}"
+            else:
+                self._params_msg = '{"type":"params","data":' + data + "}"
+        return self._params_msg
+
+    def params_frame(self):
+        """프레임과 같은 큐로 보낼 params 메시지 (_pack 인코딩, 캐시). 접속 직후 첫 메시지는
+        사람이 읽을 수 있게 params_message()(JSON)를 그대로 씀."""
+        if self._params_frame is None:
+            if ormsgpack is not None:
+                self._params_frame = _pack({"type": "params", "data": self.params_dict()})
+            else:
+                self._params_frame = self.params_message()
+        return self._params_frame
+
+    def _invalidate_params_cache(self):
+        self._params_dict = None
+        self._params_json = None
+        self._params_msg = None
+        self._params_frame = None
+
     def update_coeffs(self, key, values):
+        self._invalidate_params_cache()
         if hasattr(self.params, key):
             setattr(self.params, key, values)
         elif key == 'yt_coeffs' and len(values) == 2:
@@ -263,15 +428,65 @@ class Pipeline:
             self.src.send_command(command)
             print("[Pipeline] Sent command to C: {}".format(command))
 
+    def apply_params(self, changed):
+        """changed가 전부 LIVE_PARAM_KEYS면 실행 중인 C 프로세스에 stdin 커맨드로 바로 반영하고 True.
+        그 외(C 인자/버퍼 크기 변경)는 아무것도 하지 않고 False → 호출 측이 재시작."""
+        if not changed or not LIVE_PARAM_KEYS.issuperset(changed):
+            return False
+        self._invalidate_params_cache()
+        for key, value in changed.items():
+            setattr(self.params, key, value)
+            if isinstance(self.src, CProcSource):
+                self.src.send_command("{} {}".format(key, value))
+        return True
+
     def register_consumer(self):
-        q = asyncio.Queue(maxsize=2)
+        """WS 핸들러(이벤트 루프 안)에서 호출. 큐와 해당 루프를 함께 등록."""
+        q = FrameQueue(maxsize=2)
+        loop = asyncio.get_running_loop()
         with self._consumers_lock:
-            self._consumers.append(q)
+            self._consumers.setdefault(loop, []).append(q)
         return q
 
+    def unregister_consumer(self, q):
+        with self._consumers_lock:
+            for loop, qs in list(self._consumers.items()):
+                qs[:] = [c for c in qs if c is not q]
+                if not qs:
+                    del self._consumers[loop]
+
+    def adopt_consumers(self, other):
+        """재시작 시 이전 파이프라인의 WS 컨슈머 큐를 그대로 넘겨받음 (클라이언트 재접속 불필요)."""
+        with other._consumers_lock:
+            moved, other._consumers = other._consumers, {}
+        with self._consumers_lock:
+            for loop, qs in moved.items():
+                self._consumers.setdefault(loop, []).extend(qs)
+
+    @staticmethod
+    def _fanout(queues, msg, is_params=False):
+        """이벤트 루프 스레드에서 실행: 같은 메시지를 그 루프의 모든 큐에 전달."""
+        for q in queues:
+            if is_params:
+                q.offer_params(msg)
+            else:
+                q.offer(msg)
+
+    def _publish(self, msg, is_params=False):
+        """인코딩된 메시지 하나를 모든 컨슈머에 전달. 어느 스레드에서든 호출 가능.
+        인코딩 1회, 루프당 스레드 간 깨우기 1회 → 클라이언트 수와 무관.
+        is_params=True면 프레임 큐가 아닌 params 슬롯으로 전달 (밀린 프레임에 밀려 버려지지 않음)."""
+        with self._consumers_lock:
+            targets = [(loop, list(qs)) for loop, qs in self._consumers.items()]
+        for loop, qs in targets:
+            try:
+                loop.call_soon_threadsafe(self._fanout, qs, msg, is_params)
+            except RuntimeError:  # 루프가 이미 종료됨
+                pass
+
     def _broadcast(self, payload):
-        # 현재 사용 안 함 (app.py에서 직접 처리)
-        pass
+        # 파이프라인 밖에서 만든 메시지(예: 초기화된 params)도 프레임과 같은 경로로 1회 인코딩 후 전달
+        self._publish(_pack(payload))
 
     def start(self):
         if self._thread and self._thread.is_alive():
@@ -311,22 +526,22 @@ class Pipeline:
                 self._pending_stage3_block, self._pending_ts = block, now
 
             elif ftype == CProcSource.FT_STAGE5:
-                series = [block[:, k].tolist() for k in range(min(4, n_ch))]
-                self._last_ravg = {"names": ["Ravg{}".format(k) for k in range(len(series))],
+                series = _frame_array(block[:, :4].T)  # 채널별 4행, JSON-safe 보장
+                self._last_ravg = {"names": _RAVG_NAMES[:len(series)],
                                    "series": series}
 
             elif ftype == CProcSource.FT_STAGE7_Y2:
-                series = [block[:, k].tolist() for k in range(min(4, n_ch))]
-                self._last_y2 = {"names": ["y2_{}".format(k) for k in range(len(series))],
+                series = _frame_array(block[:, :4].T)
+                self._last_y2 = {"names": _Y2_NAMES[:len(series)],
                                  "series": series}
 
             elif ftype == CProcSource.FT_STAGE8_Y3:
-                series = [block[:, k].tolist() for k in range(min(4, n_ch))]
-                self._last_y3 = {"names": ["y3_{}".format(k) for k in range(len(series))],
+                series = _frame_array(block[:, :4].T)
+                self._last_y3 = {"names": _Y3_NAMES[:len(series)],
                                  "series": series}
 
             elif ftype == CProcSource.FT_YT:
-                series = [block[:, k].tolist() for k in range(min(4, n_ch))]
+                series = _frame_array(block[:, :4].T)
                 self._last_yt = {"names": self.params.label_names[:len(series)], "series": series}
 
                 stats = None
@@ -334,8 +549,7 @@ class Pipeline:
                     dt = max(1e-9, now - self._last_yt_time)
                     proc_sps_per_ch = n_samp / dt
                     stats = {
-                        "sampling_frequency": float(self.params.sampling_frequency),
-                        "block_samples": int(self.params.block_samples),
+                        **self._stats_base,
                         "actual_block_time_ms": float(dt * 1000.0),
                         "actual_blocks_per_sec": float(1.0 / dt),
                         "actual_proc_kSps": float(proc_sps_per_ch / 1000.0),
@@ -345,30 +559,19 @@ class Pipeline:
                 self._last_stats = stats
 
                 if self._pending_stage3_block is not None:
-                    payload = {
-                        "type": "frame",
-                        "ts": self._pending_ts,
-                        "y_block": self._pending_stage3_block.tolist(),
-                        "n_ch": int(self._pending_stage3_block.shape[1]),
-                        "block": {"n": int(self._pending_stage3_block.shape[0])},
-                        "params": {"target_rate_hz": self.params.target_rate_hz},
-                        "ravg_signals": self._last_ravg,
-                        "stage7_y2": self._last_y2,
-                        "stage8_y3": self._last_y3,
-                        "derived": self._last_yt,
-                        "stats": self._last_stats,
-                    }
-
-                    text = json.dumps(_json_safe(payload),
-                                      separators=(",", ":"),
-                                      allow_nan=False)
-                    with self._consumers_lock:
-                        for q in list(self._consumers):
-                            try:
-                                if q.full():
-                                    _ = q.get_nowait()
-                                q.put_nowait(text)
-                            except Exception:
-                                pass
+                    blk = self._pending_stage3_block
+                    payload = self._frame_payload
+                    payload["ts"] = self._pending_ts
+                    payload["y_block"] = _frame_array(blk)
+                    payload["n_ch"] = int(blk.shape[1])
+                    payload["block"]["n"] = int(blk.shape[0])
+                    payload["ravg_signals"] = self._last_ravg
+                    payload["stage7_y2"] = self._last_y2
+                    payload["stage8_y3"] = self._last_y3
+                    payload["derived"] = self._last_yt
+                    payload["stats"] = _json_safe(self._last_stats)
+
+                    # 배열은 _frame_array, 스칼라는 위에서 정규화 → payload 전체를 다시 훑지 않음
+                    self._publish(_pack(payload))
 
                     self._pending_stage3_block, self._pending_ts = None, None
\ No newline at end of file
@@ -13,6 +13,9 @@ import Chart from 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/auto/+esm';
 // Zoom 플러그인 모듈 import
 import zoomPlugin from 'https://cdn.jsdelivr.net/npm/chartjs-plugin-zoom@2.0.1/+esm';
 
+// MessagePack 디코더 (서버에 ormsgpack이 있으면 WS 프레임이 MessagePack 바이너리로 옴)
+import { decode as msgpackDecode } from 'https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/+esm';
+
 // Chart.js에 zoom 플러그인 등록 (등록하지 않으면 확대/축소 기능 작동 X)
 Chart.register(zoomPlugin);
 
@@ -23,6 +26,23 @@ let initialParams = null;
 // ✅ 차트에 표시할 최대 데이터 포인트 수 (메모리 관리)
 const MAX_DATA_POINTS = 36000;
 
+// ✅ 차트 다시 그리기는 화면 프레임(requestAnimationFrame)당 한 번으로 묶음
+//  - WS 프레임마다 update()하지 않고 '변경된 차트'만 표시해 두었다가 한 번에 그림
+//  - 탭이 숨겨져 있으면 rAF가 멈추므로 그리기 비용도 0 (데이터는 계속 누적)
+const dirtyCharts = new Set();
+let chartFlushPending = false;
+
+function scheduleChartUpdate(chart) {
+  dirtyCharts.add(chart);
+  if (chartFlushPending) return;
+  chartFlushPending = true;
+  requestAnimationFrame(() => {
+    chartFlushPending = false;
+    dirtyCharts.forEach((c) => c.update('none'));
+    dirtyCharts.clear();
+  });
+}
+
 // ============================================================
 //  [DOM 요소 참조]
 // ------------------------------------------------------------
@@ -357,12 +377,14 @@ function appendDataToFig2(data, dt) {
       chart.data.labels.push(...new_times);
       chart.data.datasets[0].data.push(...channelData);
 
-      while (chart.data.labels.length > MAX_DATA_POINTS) {
-        chart.data.labels.shift();
-        chart.data.datasets[0].data.shift();
+      // 초과분을 한 번에 잘라냄 (shift 반복은 매번 배열 전체를 당김)
+      const excess = chart.data.labels.length - MAX_DATA_POINTS;
+      if (excess > 0) {
+        chart.data.labels.splice(0, excess);
+        chart.data.datasets[0].data.splice(0, excess);
       }
       
-      chart.update('none');
+      scheduleChartUpdate(chart);
     });
   });
 }
@@ -440,14 +462,15 @@ function appendDataToChart(chart, x_block, y_block_2d) {
     chart.data.datasets[ch].data.push(...newChannelData);
   }
 
-  // 3. 최대 데이터 포인트 수를 초과하면 오래된 데이터 제거
-  while (chart.data.labels.length > MAX_DATA_POINTS) {
-    chart.data.labels.shift();
-    chart.data.datasets.forEach((dataset) => dataset.data.shift());
+  // 3. 최대 데이터 포인트 수를 초과하면 오래된 데이터를 한 번에 제거
+  const excess = chart.data.labels.length - MAX_DATA_POINTS;
+  if (excess > 0) {
+    chart.data.labels.splice(0, excess);
+    chart.data.datasets.forEach((dataset) => dataset.data.splice(0, excess));
   }
 
-  // 4. 차트 업데이트
-  chart.update('none');
+  // 4. 차트 업데이트 (다음 화면 프레임에 한 번)
+  scheduleChartUpdate(chart);
 }
 
 // ============================================================
@@ -739,6 +762,11 @@ async function postParams(diff) {
     body: JSON.stringify(diff),
   });
   const j = await r.json();
+  if (!r.ok) {
+    // 범위를 벗어난 값(0/음수 등)은 서버가 422로 거부 → UI는 현재 값 유지
+    console.error('[params] rejected', j.detail);
+    return;
+  }
   if (j.restarted) {
     softReconnectCharts();
   } else {
@@ -938,7 +966,7 @@ function updateYtValuesDisplay(latestValues) {
   // 배열의 각 값을 "yt0: 1.2345" 형태의 HTML 문자열로 변환
   const items = latestValues.map((v, i) => {
     // 값이 null이거나 유효하지 않으면 '---'로 표시, 아니면 소수점 4자리까지
-    const valueStr = v === null || v === undefined ? '---' : v.toFixed(4);
+    const valueStr = v === null || v === undefined || Number.isNaN(v) ? '---' : v.toFixed(4);
     return `yt${i}: <span class="stat-value">${valueStr}</span>`;
   });
 
@@ -986,6 +1014,85 @@ function gatherAllChartData() {
 //  [WebSocket 연결 & 데이터 핸들링]
 // ============================================================
 let ws;
+const wsDecoder = new TextDecoder();
+
+// WS 메시지 디코드: '{' / '[' 로 시작하면 JSON(접속 직후 params, ormsgpack 없는 서버), 아니면 MessagePack
+function decodeWsData(data) {
+  if (typeof data === 'string') return JSON.parse(data);
+  const bytes = new Uint8Array(data);
+  if (bytes[0] === 0x7b || bytes[0] === 0x5b) return JSON.parse(wsDecoder.decode(bytes));
+  return msgpackDecode(bytes);
+}
+
+// 서버 메시지 하나 처리 (params 또는 frame)
+function handleWsMessage(m) {
+  if (m.type === 'params') {
+    applyParamsToUI(m.data);
+    return;
+  }
+
+  if (m.type === 'frame') {
+    const tRate = Number(m?.params?.target_rate_hz);
+    const dt = tRate > 0 ? 1.0 / tRate : null;
+    const y_block = Array.isArray(m.y_block) ? m.y_block : null;
+    const ravg_block =
+      m.ravg_signals && Array.isArray(m.ravg_signals.series)
+        ? m.ravg_signals.series
+        : null;
+
+    // --- Raw Data (Stage3) 그래프 데이터 처리 ---
+    if (y_block && y_block.length > 0 && dt !== null) {
+      const n1 = y_block.length;
+      const new_times1 = Array.from(
+        { length: n1 },
+        (_, i) => lastTimeX1 + (i + 1) * dt
+      );
+      lastTimeX1 = new_times1[new_times1.length - 1];
+      appendDataToChart(fig1, new_times1, y_block);
+    }
+
+    // --- Raw Data (Stage5) 그래프 데이터 처리 ---
+    if (ravg_block && ravg_block.length > 0 && dt !== null) {
+      const chCount = ravg_block.length;
+      const sampleCount = Array.isArray(ravg_block[0])
+        ? ravg_block[0].length
+        : 0;
+      if (sampleCount > 0) {
+        const ravg_transposed = Array.from(
+          { length: sampleCount },
+          (_, s) =>
+            Array.from({ length: chCount }, (_, c) => ravg_block[c][s])
+        );
+        const n3 = sampleCount;
+        const new_times3 = Array.from(
+          { length: n3 },
+          (_, i) => lastTimeX3 + (i + 1) * dt
+        );
+        lastTimeX3 = new_times3[new_times3.length - 1];
+        appendDataToChart(fig3, new_times3, ravg_transposed);
+      }
+    }
+    
+    // --- 4ch 탭 (Stage 7, 8, 9) 그래프 데이터 처리 ---
+    if (m.derived && m.stage7_y2 && m.stage8_y3 && dt !== null) {
+      appendDataToFig2(m, dt);
+    }
+    
+    // --- 4ch 탭 실시간 텍스트 값 표시 (최종 YT 값만 사용) ---
+    if (m.derived && m.derived.series) {
+      const latestYtValues = m.derived.series.map((channelData) =>
+        channelData.length > 0 ? channelData[channelData.length - 1] : null
+      );
+      updateYtValuesDisplay(latestYtValues);
+    }
+
+    // --- 헤더 통계 정보 업데이트 ---
+    if (m.stats) {
+      updateStatsDisplay(m.stats);
+    }
+    return;
+  }
+}
 
 function connectWS() {
   const url =
@@ -993,79 +1100,17 @@ function connectWS() {
     location.host +
     '/ws';
   ws = new WebSocket(url);
+  // 서버가 orjson/MessagePack bytes를 바이너리 프레임으로 보냄 → ArrayBuffer로 받아 바로 디코드
+  ws.binaryType = 'arraybuffer';
 
   ws.onopen = () => {};
 
   ws.onmessage = (ev) => {
   try {
-    const m = JSON.parse(ev.data);
-
-    if (m.type === 'params') {
-      applyParamsToUI(m.data);
-      return;
-    }
-
-    if (m.type === 'frame') {
-      const tRate = Number(m?.params?.target_rate_hz);
-      const dt = tRate > 0 ? 1.0 / tRate : null;
-      const y_block = Array.isArray(m.y_block) ? m.y_block : null;
-      const ravg_block =
-        m.ravg_signals && Array.isArray(m.ravg_signals.series)
-          ? m.ravg_signals.series
-          : null;
-
-      // --- Raw Data (Stage3) 그래프 데이터 처리 ---
-      if (y_block && y_block.length > 0 && dt !== null) {
-        const n1 = y_block.length;
-        const new_times1 = Array.from(
-          { length: n1 },
-          (_, i) => lastTimeX1 + (i + 1) * dt
-        );
-        lastTimeX1 = new_times1[new_times1.length - 1];
-        appendDataToChart(fig1, new_times1, y_block);
-      }
-
-      // --- Raw Data (Stage5) 그래프 데이터 처리 ---
-      if (ravg_block && ravg_block.length > 0 && dt !== null) {
-        const chCount = ravg_block.length;
-        const sampleCount = Array.isArray(ravg_block[0])
-          ? ravg_block[0].length
-          : 0;
-        if (sampleCount > 0) {
-          const ravg_transposed = Array.from(
-            { length: sampleCount },
-            (_, s) =>
-              Array.from({ length: chCount }, (_, c) => ravg_block[c][s])
-          );
-          const n3 = sampleCount;
-          const new_times3 = Array.from(
-            { length: n3 },
-            (_, i) => lastTimeX3 + (i + 1) * dt
-          );
-          lastTimeX3 = new_times3[new_times3.length - 1];
-          appendDataToChart(fig3, new_times3, ravg_transposed);
-        }
-      }
-      
-      // --- 4ch 탭 (Stage 7, 8, 9) 그래프 데이터 처리 ---
-      if (m.derived && m.stage7_y2 && m.stage8_y3 && dt !== null) {
-        appendDataToFig2(m, dt);
-      }
-      
-      // --- 4ch 탭 실시간 텍스트 값 표시 (최종 YT 값만 사용) ---
-      if (m.derived && m.derived.series) {
-        const latestYtValues = m.derived.series.map((channelData) =>
-          channelData.length > 0 ? channelData[channelData.length - 1] : null
-        );
-        updateYtValuesDisplay(latestYtValues);
-      }
-
-      // --- 헤더 통계 정보 업데이트 ---
-      if (m.stats) {
-        updateStatsDisplay(m.stats);
-      }
-      return;
-    }
+    const parsed = decodeWsData(ev.data);
+    // 밀린 프레임은 서버가 배열 하나로 묶어 보냄 → 순서대로 처리
+    const msgs = Array.isArray(parsed) ? parsed : [parsed];
+    for (const m of msgs) handleWsMessage(m);
   } catch (e) {
     console.error('WebSocket message parse error', e);
   }
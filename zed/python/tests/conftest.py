@@ -0,0 +1,8 @@
+# 테스트에서 main.py(zed/python)와 server/*.py를 패키지 설치 없이 import
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for p in (ROOT, ROOT / "server"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
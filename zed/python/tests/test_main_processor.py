@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import main
+
+
+@pytest.fixture(params=["fused", "numpy"])
+def processor_path(request, monkeypatch):
+    """Numba 융합 커널과 NumPy/SciPy 단계별 경로 둘 다 검사"""
+    if request.param == "fused":
+        if main._process_fused is None:
+            pytest.skip("numba not installed")
+    else:
+        monkeypatch.setattr(main, "_process_fused", None)
+    return request.param
+
+
+@pytest.mark.parametrize("ma_n", [1, 5, 8])
+def test_constant_input_is_flat_across_blocks(processor_path, monkeypatch, ma_n):
+    # 블록마다 MA를 0 패딩으로 다시 시작하면 블록 앞에서 딥(5.0 → ~3.9)이 반복됨
+    monkeypatch.setattr(main, "MOVING_AVG_N", ma_n)
+    p = main.Processor(100_000)
+    y = np.concatenate([p.process(np.full(1000, 5.0, dtype=np.float32))[0] for _ in range(5)])
+    np.testing.assert_allclose(y, 5.0, rtol=1e-5)
+
+
+def test_blocks_match_one_shot_filter(processor_path, monkeypatch):
+    # 블록으로 나눠 처리(N-1보다 짧은 블록 포함)한 결과 == 전체를 한 번에 처리한 후행 MA + LPF
+    from scipy.signal import sosfilt, sosfilt_zi
+    monkeypatch.setattr(main, "MOVING_AVG_N", 8)
+    x = np.random.default_rng(0).standard_normal(2003).astype(np.float32) + 2.0
+    p = main.Processor(100_000)
+    y = np.concatenate([p.process(x[i:i + 500])[0] for i in range(0, 2003, 500)])
+    ma = np.convolve(np.concatenate([np.full(7, x[0]), x]).astype(np.float64), np.ones(8) / 8, mode="valid")
+    sos = p.sos.astype(np.float64)
+    ref, _ = sosfilt(sos, ma, zi=sosfilt_zi(sos) * x[0])
+    np.testing.assert_allclose(y, ref, atol=1e-4)
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import app as server_app
+from pipeline import FrameQueue
+
+
+def test_params_pushed_while_frame_in_flight(monkeypatch):
+    # params 전송(await) 도중 params 두 번 + 프레임이 들어오면 큐는 [None 토큰, 프레임]
+    # → 토큰이 배치에 섞이지 않고, 최신 params가 프레임보다 먼저 나가야 함
+    async def scenario():
+        q = FrameQueue(maxsize=2)
+        sent = []
+
+        async def fake_send(ws, msg):
+            sent.append(msg)
+            if msg == b'{"p":1}':
+                q.offer_params(b'{"p":2}')
+                q.offer_params(b'{"p":3}')
+                q.offer(b'{"f":2}')
+            await asyncio.sleep(0)
+
+        monkeypatch.setattr(server_app, "_ws_send", fake_send)
+        q.offer(b'{"f":1}')
+        q.offer_params(b'{"p":1}')
+        sender = asyncio.create_task(server_app._ws_sender(None, q))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        assert not sender.done(), sender.exception()
+        sender.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sender
+        return sent, q
+
+    sent, q = asyncio.run(scenario())
+    assert sent[0] == b'{"p":1}'
+    assert sent[1] == b'{"p":3}'  # 덮어쓴 p2는 보내지 않음
+    assert None not in sent
+    frames = b"".join(sent[2:])
+    assert b'{"f":1}' in frames and b'{"f":2}' in frames
+    assert q.params_msg is None and q.empty()